@@ -0,0 +1,65 @@
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import shutil
+
+from thales.build import create_structure, io_structure
+from thales.config import paths
+from thales.config.cache import save_yaml
+from thales.config.utils import DEFAULT_SUBDIR
+
+
+FIELDMAP = {"datetime": "DateTime", "open": "1. open", "high": "2. high", "low": "3. low", "raw_close": "4. close",
+            "close": "5. adjusted close", "volume": "6. volume", "symbol": "SYMBOL"}
+
+
+@pytest.fixture
+def io_dir(tmp_path, monkeypatch):
+    """Empty `.thales_IO` directory in a temporary directory, with a fieldmap
+    for the default source."""
+    create_structure(structure=io_structure, base_dir=str(tmp_path))
+    monkeypatch.setattr(paths, "IO_DIR", str(tmp_path / ".thales_IO"))
+    save_yaml(FIELDMAP, paths.io_path("fieldmaps", filename="alphavantage.yaml"))
+    return paths.IO_DIR
+
+
+@pytest.fixture
+def data_dir(io_dir):
+    """Scraped data directory of the default source and endpoint."""
+    return paths.io_path("scraped_data", "alphavantage", DEFAULT_SUBDIR, make_subdirs=True)
+
+
+def scraped_prices(sym: str, dates: object, close: object,
+                   request_time: str = "2020_05_01 10;00;00") -> pd.DataFrame:
+    """DataFrame of daily prices as saved by the Alpha Vantage scraper (newest
+    first)."""
+    dates = pd.DatetimeIndex(dates)
+    close = np.broadcast_to(np.asarray(close, dtype="float64"), (len(dates),))
+    df = pd.DataFrame({"datetime": dates, "open": close, "high": close + 1, "low": close - 1, "raw_close": close,
+                       "close": close, "volume": 1000.0, "SYMBOL": sym, "request_time": request_time})
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def write_csv(df: pd.DataFrame, fp: str) -> str:
+    df.to_csv(fp, encoding="utf-8", index=False)
+    return fp
+
+
+@pytest.fixture
+def toy_dataset():
+    """Name of a temporary toy dataset of minute data for 2017 to 2019, with
+    `close` rising through each year from 100 to 300."""
+    name = f"PYTEST_{os.getpid()}_1m"
+    directory = paths.package_path("data", "toy_datasets", name)
+    os.makedirs(directory)
+    try:
+        for i, year in enumerate((2017, 2018, 2019)):
+            index = pd.date_range(f"{year}-01-02", periods=1000, freq="min")
+            close = 100 * (i + 1) + np.linspace(0, 50, len(index))
+            df = pd.DataFrame({"datetime": index, "open": close, "high": close + 1, "low": close - 1,
+                               "close": close})
+            write_csv(df, os.path.join(directory, f"{year}.csv"))
+        yield name
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,57 @@
+import os
+import pandas as pd
+import pytest
+
+from tests.conftest import scraped_prices, write_csv
+from thales.config.cache import save_yaml
+from thales.data import CSVLoader
+from thales.data.catalog import Catalog
+from thales.data.segments import write_segment
+
+
+def test_record_segment_without_entry_reads_base_and_segment(data_dir):
+    base = write_csv(scraped_prices("AAPL", pd.bdate_range("2020-01-01", "2020-02-11"), 10),
+                     os.path.join(data_dir, "AAPL.csv"))
+    catalog = Catalog()
+    save_yaml(dict(), catalog.fp)  # A catalog exists, but without the symbol.
+    assert catalog.entry("AAPL") is None
+
+    segment = scraped_prices("AAPL", pd.bdate_range("2020-02-12", "2020-03-18"), 20, "2020_03_18 10;00;00")
+    fp = write_segment(segment, "AAPL", request_time="2020_03_18 10;00;00")
+    catalog.record_segment("AAPL", segment, fp, request_time="2020_03_18 10;00;00")
+
+    entry = catalog.entry("AAPL")
+    assert entry["segments"] == 1
+    assert catalog.coverage("AAPL") == (pd.Timestamp("2020-01-01"), pd.Timestamp("2020-03-18"))
+    df = CSVLoader.load_by_symbol("AAPL")
+    assert df["datetime"].max() == pd.Timestamp("2020-03-18")
+    assert df["close"].max() == 20
+    assert os.path.exists(base)
+
+
+def test_loading_missing_symbol_does_not_write_catalog(data_dir):
+    write_csv(scraped_prices("AAPL", pd.bdate_range("2020-01-01", "2020-02-11"), 10),
+              os.path.join(data_dir, "AAPL.csv"))
+    catalog = Catalog()
+    catalog.get()  # Builds the catalog.
+    mtime = os.stat(catalog.fp).st_mtime_ns
+    with pytest.warns(UserWarning, match="MSFT"):
+        CSVLoader.load_by_symbol("AAPL", "MSFT")
+    CSVLoader.missing_dates("MSFT")
+    CSVLoader.resample("MSFT", freq="W")
+    assert os.stat(catalog.fp).st_mtime_ns == mtime
+    assert catalog.symbols == ["AAPL"]
+
+
+def test_refresh(data_dir):
+    fp = write_csv(scraped_prices("AAPL", pd.bdate_range("2020-01-01", "2020-02-11"), 10),
+                   os.path.join(data_dir, "AAPL.csv"))
+    catalog = Catalog()
+    save_yaml(dict(), catalog.fp)
+    entry = catalog.refresh("AAPL")
+    assert entry == catalog.entry("AAPL")
+    assert (entry["rows"], entry["segments"]) == (30, 0)
+    assert catalog.coverage("AAPL") == (pd.Timestamp("2020-01-01"), pd.Timestamp("2020-02-11"))
+    os.remove(fp)
+    assert catalog.refresh("AAPL") == dict()
+    assert catalog.entry("AAPL") is None
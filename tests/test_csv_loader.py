@@ -0,0 +1,67 @@
+import numpy as np
+import os
+import pandas as pd
+
+from tests.conftest import scraped_prices, write_csv
+from thales.data import CSVLoader
+from thales.data.csv_loader import latest_rows
+from thales.data.segments import write_segment
+
+
+def brute_force_latest(df: pd.DataFrame) -> pd.DataFrame:
+    """Most recently requested row for each (symbol, datetime), with ties
+    broken by the largest volume and then the last row."""
+    rows = list()
+    for _, group in df.groupby(["symbol", "datetime"], sort=True):
+        group = group.loc[group["request_time"] == group["request_time"].max()]
+        group = group.loc[group["volume"] == group["volume"].max()]
+        rows.append(group.index[-1])
+    return df.loc[rows]
+
+
+def random_scrapes(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "datetime": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.randint(0, n // 4, n), unit="D"),
+        "symbol": rng.choice(["AAPL", "MSFT"], n),
+        "request_time": pd.Timestamp("2020-06-01") + pd.to_timedelta(rng.randint(0, 3, n), unit="D"),
+        "volume": rng.randint(0, 3, n).astype(float),
+        "row": np.arange(n)})
+
+
+def test_latest_rows_matches_brute_force():
+    df = random_scrapes(500)
+    groups = pd.factorize(df["symbol"])[0]
+    rows = latest_rows(df["datetime"], df["request_time"], groups=groups, tiebreak=df["volume"].to_numpy())
+    expected = brute_force_latest(df)
+    # Rows are ordered by group (in order of appearance) then datetime:
+    expected = expected.iloc[np.lexsort((expected["datetime"], pd.Categorical(
+        expected["symbol"], categories=pd.unique(df["symbol"])).codes))]
+    np.testing.assert_array_equal(df["row"].to_numpy()[rows], expected["row"].to_numpy())
+
+
+def test_merge_by_request_time_matches_dedupe():
+    df = random_scrapes(600, seed=1)
+    df = df.loc[df["symbol"] == "AAPL"].reset_index(drop=True)
+    ascending = df.iloc[:200].sort_values("datetime", kind="stable")
+    descending = df.iloc[200:400].sort_values("datetime", ascending=False, kind="stable")
+    unsorted = df.iloc[400:]
+    expected = CSVLoader.dedupe_by_request_time(pd.concat([ascending, descending, unsorted]))
+    for chunk_size in (1, 7, 1000):  # Several blocks, and a single block.
+        merged = CSVLoader.merge_by_request_time([ascending.copy(), descending.copy(), unsorted.copy()],
+                                                 chunk_size=chunk_size)
+        np.testing.assert_array_equal(merged["row"].to_numpy(), expected["row"].to_numpy())
+
+
+def test_load_keeps_most_recent_scrape(data_dir):
+    write_csv(scraped_prices("AAPL", pd.bdate_range("2020-01-01", "2020-03-31"), 10, "2020_04_01 10;00;00"),
+              os.path.join(data_dir, "AAPL.csv"))
+    segment = scraped_prices("AAPL", pd.bdate_range("2020-03-02", "2020-04-30"), 20, "2020_05_01 10;00;00")
+    write_segment(segment, "AAPL", request_time="2020_05_01 10;00;00")
+
+    df = CSVLoader.load_by_symbol("AAPL")
+    assert df["datetime"].is_monotonic_increasing and df["datetime"].is_unique
+    assert df["datetime"].iloc[0] == pd.Timestamp("2020-01-01")
+    assert df["datetime"].iloc[-1] == pd.Timestamp("2020-04-30")
+    assert (df.loc[df["datetime"] < pd.Timestamp("2020-03-02"), "close"] == 10).all()
+    assert (df.loc[df["datetime"] >= pd.Timestamp("2020-03-02"), "close"] == 20).all()
@@ -0,0 +1,55 @@
+import numpy as np
+import os
+import pandas as pd
+import pytest
+
+from tests.conftest import scraped_prices, write_csv
+from thales.data.catalog import Catalog
+from thales.data.feature_store import FeatureStore, spec_key
+
+
+@pytest.fixture
+def features():
+    index = pd.DatetimeIndex(pd.bdate_range("2020-01-01", periods=20), name="datetime")
+    return pd.DataFrame({"AAPL_close_SMA (n=2)": np.arange(20.0), "AAPL_close_SMA (n=3)": np.arange(20.0) * 2},
+                        index=index)
+
+
+def _specs(df: pd.DataFrame) -> dict:
+    return {c: spec_key("sma", sym="AAPL", ohlct="c", n=int(c[-2])) for c in df.columns}
+
+
+def _scrape(data_dir: str, close: float):
+    write_csv(scraped_prices("AAPL", pd.bdate_range("2020-01-01", periods=20), close),
+              os.path.join(data_dir, "AAPL.csv"))
+    Catalog().refresh("AAPL")
+
+
+def test_columns_are_fresh_until_data_changes(data_dir, features):
+    _scrape(data_dir, 10)
+    FeatureStore("AAPL").save(features, _specs(features))
+    store = FeatureStore("aapl")
+    assert sorted(store.fresh()) == sorted(features.columns)
+    loaded = store.load("AAPL_close_SMA (n=3)")["feature"]
+    assert list(loaded.columns) == ["AAPL_close_SMA (n=3)"]
+    assert loaded.index.equals(features.index)
+    np.testing.assert_array_equal(loaded.values, features[["AAPL_close_SMA (n=3)"]].values)
+
+    _scrape(data_dir, 11)
+    assert FeatureStore("AAPL").fresh() == dict()
+    assert FeatureStore("AAPL").load() == dict()
+
+
+def test_precision_is_part_of_version(data_dir, features):
+    _scrape(data_dir, 10)
+    FeatureStore("AAPL", precision=5).save(features, _specs(features))
+    assert FeatureStore("AAPL", precision=2).fresh() == dict()
+
+
+def test_symbol_without_checksum_is_never_fresh(data_dir, features):
+    store = FeatureStore("AAPL")
+    assert store.version is None
+    with pytest.warns(UserWarning, match="No catalog checksum"):
+        store.save(features, _specs(features))
+    assert not os.path.exists(store.manifest_fp)
+    assert FeatureStore("AAPL").fresh() == dict()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from thales.data.labels import first_touch, forward_labels, label_name
+
+
+def prices(n: int = 300, seed: int = 0) -> pd.Series:
+    rng = np.random.RandomState(seed)
+    s = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), name="AAPL_close")
+    s.iloc[[n // 6, n // 6 + 1, 2 * n // 3]] = np.nan
+    return s
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 2 ** 16])
+def test_forward_labels_match_rolling(chunk_size):
+    s, horizons = prices(), [1, 3, 5, 16, 33]
+    funcs = ("shift", "pc", "min", "max", "mean", "sum", "std", "vol")
+    df = forward_labels(s, horizons, funcs=funcs, chunk_size=chunk_size)
+    for n in horizons:
+        rolling = s.rolling(n)
+        expected = {"shift": s.shift(-n), "pc": (s.shift(-n) - s) / s, "min": rolling.min().shift(-n),
+                    "max": rolling.max().shift(-n), "mean": rolling.mean().shift(-n),
+                    "sum": rolling.sum().shift(-n), "std": rolling.std().shift(-n),
+                    "vol": s.pct_change(fill_method=None).rolling(n).std().shift(-n)}
+        for f in funcs:
+            np.testing.assert_allclose(df[label_name(s.name, f, n)].to_numpy(), expected[f].to_numpy(),
+                                       rtol=1e-9, atol=1e-12, err_msg=f"{f} n={n}")
+
+
+def brute_force_touch(close, high, low, upper, lower, n):
+    size = len(close)
+    label, periods, change = np.full(size, np.nan), np.full(size, np.nan), np.full(size, np.nan)
+    for i in range(size):
+        if np.isnan(close[i]) or np.isnan(upper[i]) or np.isnan(lower[i]):
+            continue
+        for k in range(1, n + 1):
+            if i + k >= size:
+                break
+            if low[i + k] <= close[i] * (1 - lower[i]):
+                label[i], periods[i] = -1, k
+            elif high[i + k] >= close[i] * (1 + upper[i]):
+                label[i], periods[i] = 1, k
+            else:
+                continue
+            break
+        else:
+            if i + n < size:
+                label[i], periods[i] = 0, n
+        if not np.isnan(periods[i]):
+            change[i] = close[i + int(periods[i])] / close[i] - 1
+    return label, periods, change
+
+
+@pytest.mark.parametrize("chunk_size", [5, None])
+def test_first_touch_matches_brute_force(chunk_size):
+    close = prices(200, seed=1).to_numpy()
+    rng = np.random.RandomState(2)
+    high, low = close * (1 + rng.uniform(0, 0.01, len(close))), close * (1 - rng.uniform(0, 0.01, len(close)))
+    upper = np.full(len(close), 0.02)
+    upper[[10, 11]] = np.nan
+    lower = rng.uniform(0.01, 0.03, len(close))
+    for h, l in ((None, None), (high, low)):
+        result = first_touch(close, upper, lower, 10, high=h, low=l, chunk_size=chunk_size)
+        expected = brute_force_touch(close, close if h is None else h, close if l is None else l, upper, lower, 10)
+        for a, b in zip(result, expected):
+            np.testing.assert_allclose(a, b)
+
+
+def test_first_touch_without_barriers_labels_time_limit():
+    close = np.linspace(100, 120, 20)
+    label, periods, change = first_touch(close, None, 0.05, 5)
+    np.testing.assert_array_equal(label[:15], 0)
+    np.testing.assert_array_equal(periods[:15], 5)
+    assert np.isnan(label[15:]).all()
+    np.testing.assert_allclose(change[:15], close[5:] / close[:15] - 1)
@@ -0,0 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from thales.data.segments import check_compactions
+
+
+def _compact(name: str) -> int:
+    if name == "BAD":
+        raise OSError("disk full")
+    return 1
+
+
+def test_check_compactions_warns_about_failures():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        futures = [(name, pool.submit(_compact, name)) for name in ("AAPL", "BAD", "MSFT")]
+    with pytest.warns(UserWarning, match="BAD: OSError: disk full"):
+        assert check_compactions(futures) == ["BAD"]
@@ -0,0 +1,35 @@
+import gc
+import numpy as np
+import os
+import pandas as pd
+
+from thales.data.spill import ColumnSpill
+
+
+def test_spill_round_trip(io_dir):
+    index = pd.date_range("2020-01-01", periods=10, freq="D")
+    df = pd.DataFrame({"a": np.arange(10.0), "b": np.linspace(0, 1, 10)}, index=index)
+    spill = ColumnSpill()
+    spill.spill(df)
+    assert "a" in spill and len(spill) == 2
+    assert spill.nbytes >= df.to_numpy().nbytes
+
+    np.testing.assert_array_equal(spill.get("a"), df["a"].to_numpy())
+    # Columns are reindexed to a different index, with NaN for new rows:
+    longer = pd.date_range("2019-12-31", periods=12, freq="D")
+    np.testing.assert_array_equal(spill.get("b", longer), df["b"].reindex(longer).to_numpy())
+
+    popped = spill.pop("b", "a", index=longer)
+    assert list(popped.columns) == ["b", "a"] and popped.index.equals(longer)
+    np.testing.assert_array_equal(popped.to_numpy(), df[["b", "a"]].reindex(longer).to_numpy())
+    assert not len(spill) and not os.listdir(spill.directory)
+
+
+def test_spill_directory_removed_when_collected(io_dir):
+    spill = ColumnSpill()
+    spill.spill(pd.DataFrame({"a": [1.0, 2.0]}))
+    directory = spill.directory
+    assert os.path.isdir(directory)
+    del spill
+    gc.collect()
+    assert not os.path.exists(directory)
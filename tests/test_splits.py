@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from sklearn.model_selection import TimeSeriesSplit
+
+from thales.data.splits import holdout, walk_forward_folds, walk_forward_steps
+
+
+@pytest.mark.parametrize("n, n_splits, max_train_size", [(100, 5, None), (103, 4, None), (50, 3, 10)])
+def test_walk_forward_folds_match_time_series_split(n, n_splits, max_train_size):
+    folds = list(walk_forward_folds(n, n_splits=n_splits, max_train_size=max_train_size))
+    expected = list(TimeSeriesSplit(n_splits=n_splits, max_train_size=max_train_size).split(np.zeros(n)))
+    assert len(folds) == len(expected)
+    for (train, val), (expected_train, expected_val) in zip(folds, expected):
+        np.testing.assert_array_equal(train, expected_train)
+        np.testing.assert_array_equal(val, expected_val)
+
+
+def test_walk_forward_folds_leave_purge_and_embargo_gap():
+    for (train, val), (full_train, full_val) in zip(walk_forward_folds(100, n_splits=4, purge=3, embargo=2),
+                                                    walk_forward_folds(100, n_splits=4)):
+        np.testing.assert_array_equal(val, full_val)
+        np.testing.assert_array_equal(train, full_train[:-5])
+        assert val[0] - train[-1] == 6
+
+
+def test_walk_forward_folds_need_training_rows():
+    assert len(list(walk_forward_folds(100, n_splits=4, purge=15, embargo=4))) == 4
+    with pytest.raises(AssertionError):
+        list(walk_forward_folds(100, n_splits=4, purge=15, embargo=5))
+
+
+def test_holdout():
+    train, test = holdout(100, 0.2, gap=5)
+    assert (train, test) == (slice(0, 75), slice(80, 100))
+
+
+def test_walk_forward_steps():
+    steps = list(walk_forward_steps(10, start=4, step=3, gap=1, window=2))
+    assert steps == [(slice(1, 3), slice(4, 7)), (slice(4, 6), slice(7, 10))]
@@ -0,0 +1,20 @@
+import pandas as pd
+
+from thales.data import test_dataset
+
+
+def test_jump_to_condition_loads_every_year_searched(toy_dataset):
+    data = test_dataset.TestDataset(toy_dataset)
+    data.load_year(2017)
+    data.jump_to_condition("close_ge_300")
+    assert data.current_datetime == pd.Timestamp("2019-01-02")
+    assert {2017, 2018, 2019} <= data.loaded_years
+    assert set(data._data.index.year) == {2017, 2018, 2019}
+    assert data._data.index.is_monotonic_increasing
+
+
+def test_jump_to_condition_without_loaded_data(toy_dataset):
+    data = test_dataset.TestDataset(toy_dataset)
+    data.jump_to_condition("close_ge_200")
+    assert data.current_datetime == pd.Timestamp("2018-01-02")
+    assert set(data._data.index.year) == {2018}
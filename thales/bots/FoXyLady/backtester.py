@@ -23,12 +23,11 @@ class FoXyLadyTester(TestDataset):
         df = self.df
 
         # Add columns for calculating 6-7am high and low values.
-        df["hour"] = df.reset_index()["datetime"].dt.hour.values
-        df["date"] = df.reset_index()["datetime"].dt.date.values
-        df["h"] = np.where(df["hour"].isin([6, 7]), df["high"], np.nan)
-        df["h"] = df.groupby(["date"])["h"].transform("max")
-        df["l"] = np.where(df["hour"].isin([6, 7]), df["low"], np.nan)
-        df["l"] = df.groupby(["date"])["l"].transform("min")
+        sessions = self.sessions
+        df["hour"] = sessions.hours
+        df["date"] = sessions.dates
+        df["h"] = sessions.to_rows(sessions.window_aggregate(df["high"], np.fmax, 6, 7))
+        df["l"] = sessions.to_rows(sessions.window_aggregate(df["low"], np.fmin, 6, 7))
 
         # Create the 6-7am mu column:
         df["mu"] = df[["h", "l"]].mean(axis=1)
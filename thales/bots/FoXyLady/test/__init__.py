@@ -58,14 +58,12 @@ class TestDataGenerator(DataSource):
             self.year = year
 
     def previous_date(self, dt: datetime.date):
-        # Some days don't have 6-7am data for some reason, so try a few times
-        # to get the previous day's data until it's found:
-        for i in range(10):
-            try:
-                dt_ix = self.dates[self.dates == dt].index
-                return self.dates.loc[dt_ix - 1].iloc[0].date()
-            except IndexError:
-                dt -= datetime.timedelta(days=1)
+        """The latest date before `dt` which has 6-7am data. Some days don't
+        have any, so the sorted dates with data are searched rather than just
+        taking the day before."""
+        i = self.dates.searchsorted(pd.Timestamp(dt), side="left")
+        if i:
+            return self.dates.iloc[i - 1].date()
 
     def generator(self, start: datetime.datetime, n_days: int = 100):
 
@@ -13,8 +13,9 @@ except ModuleNotFoundError:
     sys.path.append(module_dir)
     import thales
 from thales.config.paths import io_path, package_path
-from thales.config.utils import date_col_from_datetime_col, DAY_FORMAT
+from thales.config.utils import DAY_FORMAT
 from thales.data import load_toy_dataset
+from thales.data.sessions import SessionIndex
 
 
 # Build out the directories for the package data:
@@ -33,14 +34,11 @@ def make_67_json(year: int):
     """Create the test JSON files of the high/low/mean price between the hours
     of 6 and 7am each day."""
     fn = f"GBPJPY_{year}_1m.csv"
-    year_df = load_toy_dataset(fn)
-    date_col_from_datetime_col(year_df)
-    year_df["hour"] = year_df["datetime"].dt.hour
-    year_df["67_high"] = np.where(year_df["hour"].isin((6, 7)), year_df["high"], np.nan)
-    year_df["67_low"] = np.where(year_df["hour"].isin((6, 7)), year_df["low"], np.nan)
-    high = year_df.groupby(["date"])["67_high"].max()
-    low = year_df.groupby(["date"])["67_low"].min()
-    data = pd.concat([high, low], axis=1).dropna()
+    year_df = load_toy_dataset(fn).sort_values(by=["datetime"])
+    sessions = SessionIndex(year_df["datetime"])
+    high = sessions.window_aggregate(year_df["high"], np.fmax, 6, 7)
+    low = sessions.window_aggregate(year_df["low"], np.fmin, 6, 7)
+    data = pd.DataFrame({"67_high": high, "67_low": low}, index=sessions.days).dropna()
     data["mean"] = data.mean(axis=1)
 
     # Save each row as a JSON file:
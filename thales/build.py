@@ -46,6 +46,7 @@ io_structure = {
             "open",
             "closed"
         ]},
+        "schemas",
         "scraped_data",
         {"stocks": [
             "master.yaml"]
@@ -1,16 +1,13 @@
 
 
-import yaml
-
+from thales.config.cache import load_yaml, save_yaml
 from thales.config.paths import io_path, package_path
 from thales.config.utils import is_valid_variable_name
 
 
 def list_bots() -> list:
     """Get a list of all registered bot names."""
-    fp = io_path(filename="bots.yaml")
-    with open(fp) as stream:
-        bots = yaml.safe_load(stream)
+    bots = load_yaml(io_path(filename="bots.yaml"))
     return list() if not bots else sorted(bots)
 
 
@@ -27,9 +24,7 @@ def register_bot(bot: str):
     package_path("bots", bot, "test", filename="__init__.py", make_subdirs=True, make_file=True)
     package_path("bots", bot, "production", filename="__init__.py", make_subdirs=True, make_file=True)
     updated_list = sorted(existing + [bot])
-    fp = io_path(filename="bots.yaml")
-    with open(fp, "w") as stream:
-        yaml.safe_dump(updated_list, stream)
+    save_yaml(updated_list, io_path(filename="bots.yaml"))
 
 
 def validate_bot_name(bot: str) -> str:
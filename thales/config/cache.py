@@ -0,0 +1,55 @@
+"""In-memory cache of parsed YAML config files. Each cached file is keyed by its
+real path and re-parsed only when its modification time or size on disk has
+changed, so repeated lookups of fieldmaps, credentials, bots etc. cost a single
+`os.stat` call rather than a full YAML parse."""
+
+import copy
+import os
+import threading
+import yaml
+
+
+_CACHE = dict()  # Maps real filepath to tuple of (mtime_ns, size, data).
+_LOCK = threading.Lock()
+
+
+def _file_key(fp: str) -> tuple:
+    stat = os.stat(fp)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_yaml(fp: str):
+    """Load the parsed contents of a YAML file, using the cached copy if the
+    file hasn't changed since it was last read. A copy is returned so that
+    callers can safely modify the data."""
+    fp = os.path.realpath(fp)
+    key = _file_key(fp)  # Raises FileNotFoundError the same way `open` does.
+    with _LOCK:
+        cached = _CACHE.get(fp)
+        if cached is None or cached[:2] != key:
+            with open(fp) as stream:
+                data = yaml.safe_load(stream)
+            _CACHE[fp] = (*key, data)
+        else:
+            data = cached[2]
+    return copy.deepcopy(data)
+
+
+def save_yaml(data: object, fp: str):
+    """Save data to a YAML file and drop any cached copy, so the next load
+    re-parses the file even if its mtime resolution is too coarse to notice the
+    change."""
+    fp = os.path.realpath(fp)
+    with _LOCK:
+        with open(fp, "w") as stream:
+            yaml.safe_dump(data, stream)
+        _CACHE.pop(fp, None)
+
+
+def invalidate(fp: str = None):
+    """Drop a single file (or all files if `fp` isn't passed) from the cache."""
+    with _LOCK:
+        if fp is None:
+            _CACHE.clear()
+        else:
+            _CACHE.pop(os.path.realpath(fp), None)
@@ -1,7 +1,6 @@
 """Manage credentials for data sources."""
 
-import yaml
-
+from thales.config.cache import load_yaml, save_yaml
 from thales.config.paths import io_path
 from thales.config.sources import validate_source
 
@@ -10,8 +9,7 @@ def get_credentials(src: str) -> dict:
     """Load stored API/website credentials for the specified source."""
     src = validate_source(src)
     credentials_fp = io_path("credentials", filename=f"{src}.yaml")
-    with open(credentials_fp) as stream:
-        credentials = yaml.safe_load(stream)
+    credentials = load_yaml(credentials_fp)
     return dict() if not credentials else credentials
 
 
@@ -21,5 +19,4 @@ def save_credentials(src: str, **credentials):
     saved = get_credentials(src)
     credentials = {**saved, **credentials}
     credentials_fp = io_path("credentials", filename=f"{src}.yaml")
-    with open(credentials_fp, "w") as stream:
-        yaml.safe_dump(credentials, stream)
+    save_yaml(credentials, credentials_fp)
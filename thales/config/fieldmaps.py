@@ -3,8 +3,8 @@
 each field throughout the package."""
 
 import pandas as pd
-import yaml
 
+from thales.config.cache import load_yaml, save_yaml
 from thales.config.exceptions import MissingRequiredColumns
 from thales.config.paths import io_path
 from thales.config.sources import validate_source
@@ -14,10 +14,7 @@ from thales.config.utils import DEFAULT_FIELDMAP
 def get_fieldmap(src: str) -> dict:
     """Load stored fieldmap for the specified API/website source."""
     src = validate_source(src)
-    fieldmap_fp = io_path("fieldmaps", filename=f"{src}.yaml")
-    with open(fieldmap_fp) as stream:
-        fieldmap_fp = yaml.safe_load(stream)
-    return fieldmap_fp
+    return load_yaml(io_path("fieldmaps", filename=f"{src}.yaml"))
 
 
 def set_fieldmap(src: str, **fieldmap):
@@ -25,9 +22,7 @@ def set_fieldmap(src: str, **fieldmap):
     saved = get_fieldmap(src)
     assert all([k in DEFAULT_FIELDMAP for k in fieldmap]), "Invalid fieldmap keys"
     fieldmap = {**saved, **fieldmap}
-    fieldmap_fp = io_path("fieldmaps", filename=f"{src}.yaml")
-    with open(fieldmap_fp, "w") as stream:
-        yaml.safe_dump(fieldmap, stream)
+    save_yaml(fieldmap, io_path("fieldmaps", filename=f"{src}.yaml"))
 
 
 def apply_fieldmap(df: pd.DataFrame, src: str = None,
@@ -3,8 +3,8 @@ associated to a registered data source."""
 
 import os
 from pathlib import Path
-import yaml
 
+from thales.config.cache import load_yaml, save_yaml
 from thales.config.paths import io_path
 from thales.config.sources import validate_source
 
@@ -39,13 +39,11 @@ class FXPairs:
     def get(self, filename: str = "master") -> list:
         """Open a list of FX currency pairs associated to this instance's
         source."""
-        fp = self.get_path(filename)
-        with open(fp, "r") as stream:
-            data = yaml.safe_load(stream)
-            if not data:
-                return list()
-            else:
-                return [tuple(p) for p in data["fx_pairs"]]
+        data = load_yaml(self.get_path(filename))
+        if not data:
+            return list()
+        else:
+            return [tuple(p) for p in data["fx_pairs"]]
 
     @staticmethod
     def validate_pairs(*pair: tuple):
@@ -67,8 +65,7 @@ class FXPairs:
         if new:
             all_pairs = sorted(set(pair) | set(current_pairs))
             fp = self.get_path(filename)
-            with open(fp, "w") as stream:
-                yaml.safe_dump({"fx_pairs": all_pairs}, stream)
+            save_yaml({"fx_pairs": all_pairs}, fp)
             str_new = [f"({p[0]}, {p[1]})" for p in new]
             print(f"Added pairs to {fp}:\n{', '.join(str_new)}")
 
@@ -85,8 +82,7 @@ class FXPairs:
         if remove:
             all_pairs = sorted(set(current_pairs) - set(pair))
             fp = self.get_path(filename)
-            with open(fp, "w") as stream:
-                yaml.safe_dump({"fx_pairs": all_pairs}, stream)
+            save_yaml({"fx_pairs": all_pairs}, fp)
             str_removed = [f"({p[0]}, {p[1]})" for p in remove]
             print(f"Removed pairs from {fp}:\n{', '.join(str_removed)}")
 
@@ -1,8 +1,8 @@
 """Manage credentials for notification systems."""
 
 import os
-import yaml
 
+from thales.config.cache import load_yaml, save_yaml
 from thales.config.paths import io_path
 
 
@@ -10,8 +10,7 @@ def get_credentials(system: str, username: str) -> dict:
     """Load stored credentials for the specified notification system."""
     credentials_fp = io_path("notifications", filename=f"{system}.yaml")
     if os.path.exists(credentials_fp):
-        with open(credentials_fp) as stream:
-            credentials = yaml.safe_load(stream)
+        credentials = load_yaml(credentials_fp)
     else:
         credentials = None
     return dict() if not credentials else credentials[username]
@@ -23,5 +22,4 @@ def save_credentials(system: str, username: str, **credentials):
     saved = get_credentials(system, username)
     credentials = {username: {**saved, **credentials}}
     credentials_fp = io_path("notifications", filename=f"{system}.yaml")
-    with open(credentials_fp, "w") as stream:
-        yaml.safe_dump(credentials, stream)
+    save_yaml(credentials, credentials_fp)
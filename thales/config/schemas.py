@@ -0,0 +1,112 @@
+"""A schema describes the data types of the columns saved in a data source's CSV
+files (float columns, the exact string format of each date column, and columns
+to store as categories), so that files can be parsed without pandas having to
+infer types or datetime formats for every value."""
+
+import os
+import pandas as pd
+
+from thales.config.cache import load_yaml, save_yaml
+from thales.config.paths import io_path
+from thales.config.sources import validate_source
+from thales.config.utils import DAY_FORMAT, DEFAULT_SCHEMA, FX_SCHEMA, SECOND_FORMAT, TOY_DATASET_SCHEMA
+
+
+def _merge_schemas(default: dict, saved: dict) -> dict:
+    """Overlay a saved schema on a default one, merging the nested dicts."""
+    schema = {k: v.copy() for k, v in default.items()}
+    for k, v in (saved or dict()).items():
+        schema[k] = {**schema[k], **v} if isinstance(v, dict) else v
+    return schema
+
+
+def get_schema(src: str = None) -> dict:
+    """Load stored schema for the specified API/website source, falling back to
+    the package default for any keys which haven't been saved."""
+    src = validate_source(src)
+    schema_fp = io_path("schemas", filename=f"{src}.yaml")
+    saved = load_yaml(schema_fp) if os.path.exists(schema_fp) else dict()
+    return _merge_schemas(DEFAULT_SCHEMA, saved)
+
+
+def set_schema(src: str, **schema):
+    """Save new schema values for the specified API/website source."""
+    src = validate_source(src)
+    assert all([k in DEFAULT_SCHEMA for k in schema]), "Invalid schema keys"
+    schema = _merge_schemas(get_schema(src), schema)
+    save_yaml(schema, io_path("schemas", filename=f"{src}.yaml", make_subdirs=True))
+
+
+def get_fx_schema(src: str = None) -> dict:
+    """Load stored schema for FX data from the specified API/website source,
+    falling back to the package default for any keys which haven't been saved.
+    """
+    src = validate_source(src)
+    schema_fp = io_path("schemas", filename=f"{src}_fx.yaml")
+    saved = load_yaml(schema_fp) if os.path.exists(schema_fp) else dict()
+    return _merge_schemas(FX_SCHEMA, saved)
+
+
+def get_dataset_schema(data_dir: str) -> dict:
+    """Load the schema for a locally stored dataset directory (e.g. the toy
+    datasets), from a `schema.yaml` file saved next to the data if it exists."""
+    schema_fp = os.path.join(data_dir, "schema.yaml")
+    saved = load_yaml(schema_fp) if os.path.exists(schema_fp) else dict()
+    return _merge_schemas(TOY_DATASET_SCHEMA, saved)
+
+
+def expand_schema(schema: dict, fieldmap: dict) -> dict:
+    """Add a source's custom field names to a schema defined with the standard
+    field names, so files saved with either naming convention are typed."""
+    expanded = _merge_schemas(schema, dict())
+    for std, custom in fieldmap.items():
+        for key in ("dtypes", "datetimes"):
+            if std in expanded[key]:
+                expanded[key].setdefault(custom, expanded[key][std])
+        if std in expanded["categories"] and custom not in expanded["categories"]:
+            expanded["categories"].append(custom)
+    return expanded
+
+
+def parse_datetime_column(s: pd.Series, fmt: str = None) -> pd.Series:
+    """Convert a column of strings to datetimes using the exact format given,
+    only falling back to pandas' format inference if the strings don't match
+    (e.g. older files saved before a schema was defined)."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    if fmt:
+        try:
+            return pd.to_datetime(s, format=fmt)
+        except (ValueError, TypeError):
+            pass
+    return pd.to_datetime(s)
+
+
+def parse_request_time(s: pd.Series) -> pd.Series:
+    """Parse a request time column, which older scrapes saved with only the
+    date (`DAY_FORMAT`) rather than to the second (`SECOND_FORMAT`)."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    parsed = pd.to_datetime(s, format=SECOND_FORMAT, errors="coerce")
+    return parsed.fillna(pd.to_datetime(s, format=DAY_FORMAT, errors="coerce"))
+
+
+def read_schema_csv(fp: str, schema: dict, **kwargs) -> pd.DataFrame:
+    """Read a CSV file with the column data types specified by `schema`. Any
+    other keyword arguments are passed to `pandas.read_csv`."""
+    # Category columns are read as plain strings here; `apply_categories` can
+    # convert them once the data is cleaned and concatenated:
+    dtype = {**schema["dtypes"], **{c: str for c in schema["categories"]}, **kwargs.pop("dtype", dict())}
+    df = pd.read_csv(fp, encoding=kwargs.pop("encoding", "utf-8"), dtype=dtype, **kwargs)
+    for col, fmt in schema["datetimes"].items():
+        if col in df.columns:
+            df[col] = parse_datetime_column(df[col], fmt)
+    return df
+
+
+def apply_categories(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Convert the schema's category columns in a DataFrame inplace."""
+    for col in schema["categories"]:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
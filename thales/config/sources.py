@@ -1,11 +1,10 @@
 
 import os
-from pathlib import Path
-import yaml
 
+from thales.config.cache import load_yaml, save_yaml
 from thales.config.exceptions import InvalidSource
 from thales.config.paths import io_path
-from thales.config.utils import DEFAULT_FIELDMAP
+from thales.config.utils import DEFAULT_FIELDMAP, DEFAULT_SCHEMA
 
 
 SOURCES_PATH = io_path(filename="sources.yaml")
@@ -14,9 +13,8 @@ DEFAULT_SRC = "alphavantage"
 
 def available_sources() -> list:
     """Get the list of currently registered data sources."""
-    with open(SOURCES_PATH, "r") as stream:
-        data = yaml.safe_load(stream)
-        return list() if not data else data["sources"]
+    data = load_yaml(SOURCES_PATH)
+    return list() if not data else data["sources"]
 
 
 SRCS = available_sources()
@@ -44,14 +42,15 @@ def register_source(src: str):
     sources = available_sources()
     if src not in sources:
         sources.append(src)
-    with open(SOURCES_PATH, "w") as stream:
-        yaml.safe_dump({"sources": sources}, stream)
+    save_yaml({"sources": sources}, SOURCES_PATH)
 
     fieldmap_fp = io_path("fieldmaps", filename=f"{src}.yaml", make_file=False)
     if not os.path.exists(fieldmap_fp):
-        Path(fieldmap_fp).touch()
-        with open(fieldmap_fp, "w") as stream:
-            yaml.safe_dump(DEFAULT_FIELDMAP, stream)
+        save_yaml(DEFAULT_FIELDMAP, fieldmap_fp)
+
+    schema_fp = io_path("schemas", filename=f"{src}.yaml", make_subdirs=True)
+    if not os.path.exists(schema_fp):
+        save_yaml(DEFAULT_SCHEMA, schema_fp)
 
     _ = io_path("credentials", filename=f"{src}.yaml", make_file=True)
 
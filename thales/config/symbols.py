@@ -3,8 +3,8 @@ a registered data source."""
 
 import os
 from pathlib import Path
-import yaml
 
+from thales.config.cache import load_yaml, save_yaml
 from thales.config.paths import io_path
 from thales.config.sources import validate_source
 from thales.config.utils import sp500
@@ -40,10 +40,8 @@ class Symbols:
         """Open a list of symbols associated to this instance's source."""
         if filename is None:
             filename = "master"
-        fp = self.get_path(filename)
-        with open(fp, "r") as stream:
-            data = yaml.safe_load(stream)
-            return list() if not data else data["symbols"]
+        data = load_yaml(self.get_path(filename))
+        return list() if not data else data["symbols"]
 
     def add(self, *sym: str, filename: str):
         """Add stock symbols to a list. Doesn't validate to check if symbols are
@@ -54,8 +52,7 @@ class Symbols:
         if new:
             new_symbols = sorted(set(sym) | set(current_symbols))
             fp = self.get_path(filename)
-            with open(fp, "w") as stream:
-                yaml.safe_dump({"symbols": new_symbols}, stream)
+            save_yaml({"symbols": new_symbols}, fp)
             print(f"Added symbols to {fp}:\n{', '.join(new)}")
 
     def remove(self, *sym: str, filename: str, remove_all: bool = False):
@@ -71,8 +68,7 @@ class Symbols:
         if remove:
             new_symbols = sorted(set(current_symbols) - set(sym))
             fp = self.get_path(filename)
-            with open(fp, "w") as stream:
-                yaml.safe_dump({"symbols": new_symbols}, stream)
+            save_yaml({"symbols": new_symbols}, fp)
             print(f"Removed symbols from {fp}:\n{', '.join(remove)}")
 
     def add_sp500(self, filename: str = "master"):
@@ -8,6 +8,7 @@ import os
 import pandas as pd
 import pytz
 import requests
+import shutil
 
 from thales.config.paths import io_path
 
@@ -36,6 +37,42 @@ MILISECOND_FORMAT = "%Y_%m_%d %H;%M;%S;%f"
 MINUTE_FORMAT = "%Y_%m_%d %H;%M"
 DATE_FORMATS = {"day": DAY_FORMAT, "second": SECOND_FORMAT, "milisecond": MILISECOND_FORMAT, "minute": MINUTE_FORMAT}
 
+# Default schemas describing the column data types in saved CSV files. The
+# `datetimes` dict maps date columns to the exact string format they're saved
+# in, and `categories` lists columns with few unique values (e.g. symbols):
+DEFAULT_SCHEMA = {
+    "dtypes": {
+        "open": "float64",
+        "high": "float64",
+        "low": "float64",
+        "close": "float64",
+        "raw_close": "float64",
+        "volume": "float64"
+    },
+    "datetimes": {
+        "datetime": "%Y-%m-%d",
+        "request_time": SECOND_FORMAT
+    },
+    "categories": ["symbol"]
+}
+FX_SCHEMA = {
+    "dtypes": {"open": "float64", "high": "float64", "low": "float64", "close": "float64"},
+    "datetimes": {"datetime": "%Y-%m-%d %H:%M:%S"},
+    "categories": ["pair"]
+}
+
+
+# Standard field names mapped to the names used in scraped FX data files:
+FX_FIELDMAP = {"datetime": "DateTime", "open": "1. open", "high": "2. high", "low": "3. low", "close": "4. close",
+               "pair": "PAIR"}
+
+
+TOY_DATASET_SCHEMA = {
+    "dtypes": {"open": "float64", "high": "float64", "low": "float64", "close": "float64", "volume": "float64"},
+    "datetimes": {"datetime": "%Y-%m-%d %H:%M:%S"},
+    "categories": []
+}
+
 
 class OHLC:
     """Construct standard OHLC column names."""
@@ -135,7 +172,11 @@ def empty_temp_dir():
     """Delete all files in the temp directory (warning: can't be undone!)"""
     files = [f for f in os.listdir(io_path("temp")) if f != "README.txt"]
     for f in files:
-        os.remove(io_path("temp", filename=f))
+        fp = io_path("temp", filename=f)
+        if os.path.isdir(fp):  # E.g. columns spilled to disk by `MLDataset`.
+            shutil.rmtree(fp)
+        else:
+            os.remove(fp)
 
 
 def date_col_from_datetime_col(df, date_col: str = "date",
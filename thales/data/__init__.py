@@ -2,6 +2,7 @@
 import pandas as pd
 
 from thales.config.paths import package_path
+from thales.config.schemas import get_dataset_schema, parse_datetime_column, read_schema_csv
 from thales.data.csv_loader import CSVLoader
 
 
@@ -15,8 +16,9 @@ def save_toy_dataset(df: pd.DataFrame, name: str, **kwargs):
 def load_toy_dataset(name: str, **kwargs):
     name = f"{name}.csv" if "." not in name else name
     fp = package_path("data", "toy_datasets", filename=f"{name}")
-    df = pd.read_csv(fp, encoding=kwargs.get("encoding", "utf-8"), **kwargs)
+    schema = get_dataset_schema(package_path("data", "toy_datasets"))
+    df = read_schema_csv(fp, schema, **kwargs)
     for c in df.columns:
         if "date" in c:
-            df[c] = pd.to_datetime(df[c])
+            df[c] = parse_datetime_column(df[c])
     return df
@@ -0,0 +1,180 @@
+"""The catalog is a YAML file saved in each source/endpoint directory of scraped
+data, recording for every symbol (or FX pair) the number of rows, the first and
+last timestamps, the most recent request time, the number of outstanding scrape
+segments and a checksum of the data. It is updated every time data is written,
+so loaders and scrapers can answer questions about what data is available
+without listing directories or opening files."""
+
+import hashlib
+import os
+import pandas as pd
+import threading
+
+from thales.config.cache import load_yaml, save_yaml
+from thales.config.fieldmaps import get_fieldmap
+from thales.config.paths import io_path
+from thales.config.schemas import parse_datetime_column, parse_request_time
+from thales.config.sources import validate_source
+from thales.config.utils import DEFAULT_SUBDIR, SECOND_FORMAT
+from thales.data.segments import list_segments
+
+
+_LOCK = threading.Lock()  # Scrapers update the catalog from background threads.
+
+
+def file_checksum(fp: str) -> str:
+    """MD5 hex digest of a file's contents."""
+    md5 = hashlib.md5()
+    with open(fp, "rb") as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _format_timestamp(ts) -> str:
+    return None if pd.isna(ts) else pd.Timestamp(ts).strftime(SECOND_FORMAT)
+
+
+def _parse_timestamp(ts: str) -> pd.Timestamp:
+    return pd.NaT if ts is None else pd.to_datetime(ts, format=SECOND_FORMAT)
+
+
+def entry_coverage(entry: dict) -> tuple:
+    """Tuple of the first and last timestamps of a catalog entry."""
+    if not entry:
+        return pd.NaT, pd.NaT
+    return _parse_timestamp(entry["first"]), _parse_timestamp(entry["last"])
+
+
+class Catalog:
+    """API for the catalog of data scraped from a source endpoint."""
+
+    def __init__(self, src: str = None, subdir: str = None):
+        self.src = validate_source(src)
+        self.subdir = DEFAULT_SUBDIR if not subdir else subdir
+        self.directory = io_path("scraped_data", self.src, self.subdir)
+        self.fp = os.path.join(self.directory, "catalog.yaml")
+
+    def get(self) -> dict:
+        """Dict of all catalog entries keyed by symbol. If no catalog has been
+        saved yet (e.g. data scraped by an older version of the package) it is
+        built by scanning the data directory once."""
+        if os.path.exists(self.fp):
+            return load_yaml(self.fp) or dict()
+        elif os.path.isdir(self.directory):
+            return self.rebuild()
+        else:
+            return dict()
+
+    def entry(self, sym: str) -> dict:
+        """Catalog entry for a single symbol, or None if it has no data."""
+        return self.get().get(sym)
+
+    @property
+    def symbols(self) -> list:
+        return sorted(self.get())
+
+    def coverage(self, sym: str) -> tuple:
+        """Tuple of the first and last timestamps available for a symbol."""
+        return entry_coverage(self.entry(sym))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Pandas DataFrame of all catalog entries."""
+        df = pd.DataFrame.from_dict(self.get(), orient="index")
+        if not len(df):
+            return pd.DataFrame(columns=["symbol", "rows", "first", "last", "request_time", "segments", "checksum"])
+        df = df.rename_axis("symbol").reset_index()
+        for col in ("first", "last", "request_time"):
+            df[col] = pd.to_datetime(df[col], format=SECOND_FORMAT)
+        return df
+
+    def _save_entry(self, sym: str, entry: dict):
+        with _LOCK:
+            catalog = load_yaml(self.fp) if os.path.exists(self.fp) else dict()
+            catalog = dict() if not catalog else catalog
+            if entry is None and sym not in catalog:
+                return  # Nothing to remove, so the file isn't rewritten.
+            if entry is None:
+                catalog.pop(sym)
+            else:
+                catalog[sym] = entry
+            save_yaml(catalog, self.fp)
+
+    @staticmethod
+    def _summarize(df: pd.DataFrame, datetime_col: str, request_time: str = None) -> dict:
+        dt = df[datetime_col]
+        if request_time is None and "request_time" in df.columns:
+            request_time = parse_request_time(df["request_time"]).max()
+        elif request_time is not None:
+            request_time = pd.to_datetime(request_time, format=SECOND_FORMAT)
+        return {"rows": int(dt.nunique()), "first": _format_timestamp(dt.min()), "last": _format_timestamp(dt.max()),
+                "request_time": _format_timestamp(request_time)}
+
+    def record_base(self, sym: str, df: pd.DataFrame, fp: str,
+                    datetime_col: str = "datetime"):
+        """Update a symbol's entry after its base file `fp` has been written
+        with the data in `df` (i.e. a first scrape or a compaction)."""
+        entry = {**self._summarize(df, datetime_col), "segments": 0, "checksum": file_checksum(fp)}
+        self._save_entry(sym, entry)
+
+    def record_segment(self, sym: str, df: pd.DataFrame, fp: str,
+                       request_time: str, datetime_col: str = "datetime"):
+        """Update a symbol's entry after a new segment `fp` has been written
+        with the data in `df`, without re-reading the symbol's other files. The
+        row count assumes a symbol's history has no gaps between scrapes. If the
+        symbol has no entry yet its entry is built from all its files."""
+        entry = self.entry(sym)
+        if not entry:
+            self.refresh(sym)
+            return
+        new = self._summarize(df, datetime_col, request_time=request_time)
+        first, last = _parse_timestamp(entry["first"]), _parse_timestamp(entry["last"])
+        dt = df[datetime_col].drop_duplicates()
+        entry["rows"] += int((dt > last).sum() + (dt < first).sum())
+        entry["first"] = min(entry["first"], new["first"], key=_parse_timestamp)
+        entry["last"] = max(entry["last"], new["last"], key=_parse_timestamp)
+        entry["request_time"] = new["request_time"]
+        entry["segments"] = entry.get("segments", 0) + 1
+        # Chain the checksums so the data version changes with every segment:
+        entry["checksum"] = hashlib.md5(f"{entry['checksum']}{file_checksum(fp)}".encode()).hexdigest()
+        self._save_entry(sym, entry)
+
+    def _build_entry(self, sym: str, datetime_col: str = None) -> dict:
+        """Build a symbol's entry by reading its base file and segments."""
+        if datetime_col is None:
+            datetime_col = get_fieldmap(self.src).get("datetime", "datetime")
+        base_fp = os.path.join(self.directory, f"{sym}.csv")
+        files = [base_fp] if os.path.exists(base_fp) else list()
+        segments = list_segments(sym, src=self.src, subdir=self.subdir)
+        files += segments
+        if not files:
+            return dict()
+        cols = {"datetime", datetime_col, "DateTime", "request_time"}
+        dfs = [pd.read_csv(f, encoding="utf-8", usecols=lambda c: c in cols) for f in files]
+        df = pd.concat(dfs, sort=False)
+        col = [c for c in ("datetime", datetime_col, "DateTime") if c in df.columns][0]
+        df[col] = parse_datetime_column(df[col])
+        checksum = file_checksum(files[0])
+        for f in files[1:]:
+            checksum = hashlib.md5(f"{checksum}{file_checksum(f)}".encode()).hexdigest()
+        return {**self._summarize(df, col), "segments": len(segments), "checksum": checksum}
+
+    def refresh(self, sym: str, datetime_col: str = None) -> dict:
+        """Rebuild a single symbol's entry by reading its base file and segments.
+        The catalog is only rewritten if the symbol has files or had an entry,
+        so looking up symbols without data doesn't write to it."""
+        entry = self._build_entry(sym, datetime_col=datetime_col)
+        self._save_entry(sym, entry if entry else None)
+        return entry
+
+    def rebuild(self) -> dict:
+        """Rebuild the whole catalog by scanning every file in the directory."""
+        symbols = {f[:-4] for f in os.listdir(self.directory) if f.endswith(".csv")}
+        segments_dir = os.path.join(self.directory, "segments")
+        if os.path.isdir(segments_dir):
+            symbols |= set(os.listdir(segments_dir))
+        entries = {sym: self._build_entry(sym) for sym in sorted(symbols)}
+        catalog = {k: v for k, v in entries.items() if v}
+        with _LOCK:
+            save_yaml(catalog, self.fp)
+        return catalog
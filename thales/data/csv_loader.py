@@ -1,13 +1,132 @@
 
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import numpy as np
 import os
 import pandas as pd
 import warnings
 
+from thales.config.cache import load_yaml, save_yaml
 from thales.config.fieldmaps import apply_fieldmap, get_fieldmap
 from thales.config.paths import io_path
+from thales.config.schemas import apply_categories, expand_schema, get_fx_schema, get_schema, \
+    parse_datetime_column, parse_request_time, read_schema_csv
 from thales.config.sources import validate_source
 from thales.config.symbols import MasterSymbols
-from thales.config.utils import DEFAULT_SUBDIR, merge_dupe_cols, SECOND_FORMAT
+from thales.config.utils import DEFAULT_SUBDIR, FX_FIELDMAP, merge_dupe_cols, parse_datetime, \
+    SECOND_FORMAT
+from thales.data.catalog import Catalog, entry_coverage
+from thales.data.gaps import missing_days
+from thales.data.resample import BarCache
+from thales.data.segments import atomic_to_csv, list_segments
+
+
+_LOADED = dict()  # Maps (loader, src, subdir, precision, name) to tuple of (checksum, DataFrame).
+FX_SUBDIR = "FX_INTRADAY"
+MERGE_CHUNK = 2 ** 16  # Rows taken from each file per block when merging files.
+
+
+def _as_int64(s: pd.Series) -> np.ndarray:
+    """View a datetime column as int64 nanoseconds."""
+    return s.to_numpy(dtype="datetime64[ns]").view("i8")
+
+
+def _merge_order(dt: np.ndarray, groups: np.ndarray = None) -> np.ndarray:
+    """Row positions which order int64 datetimes by group then datetime. The
+    sort on datetime is stable and run-adaptive, so rows concatenated from
+    files that are each already sorted are ordered in O(n log k) time, with
+    rows sharing a datetime kept in file order."""
+    if groups is None:
+        return np.argsort(dt, kind="stable")
+    if (np.diff(groups) < 0).any():  # Groups aren't contiguous so order them first:
+        order = np.argsort(groups, kind="stable")
+        return order[_merge_order(dt[order], groups[order])]
+    # Merge the datetimes within each group's contiguous block of rows:
+    bounds = np.r_[0, np.flatnonzero(np.diff(groups)) + 1, len(groups)]
+    return np.concatenate([a + np.argsort(dt[a:b], kind="stable") for a, b in zip(bounds[:-1], bounds[1:])])
+
+
+def latest_rows(dt: pd.Series, request_time: pd.Series,
+                groups: np.ndarray = None,
+                tiebreak: np.ndarray = None) -> np.ndarray:
+    """Row positions of the most recently requested row for each unique
+    (group, datetime), found with a single linear pass over the merged rows.
+    Ties on request time are broken by the largest `tiebreak` value (e.g.
+    volume) and then by the last row in file order."""
+    dt = _as_int64(dt)
+    order = _merge_order(dt, groups)
+    n = len(order)
+    if not n:
+        return order
+    dt, rt = dt[order], _as_int64(request_time)[order]
+    new_key = np.r_[True, dt[1:] != dt[:-1]]
+    if groups is not None:
+        g = groups[order]
+        new_key[1:] |= g[1:] != g[:-1]
+    starts = np.flatnonzero(new_key)
+    key_ix = np.cumsum(new_key) - 1
+
+    # Candidates are the rows with the latest request time in their key:
+    candidate = rt == np.maximum.reduceat(rt, starts)[key_ix]
+    if tiebreak is not None:
+        tb = np.where(candidate & ~np.isnan(tiebreak[order]), tiebreak[order], -np.inf)
+        candidate &= tb == np.maximum.reduceat(tb, starts)[key_ix]
+    position = np.where(candidate, np.arange(n), -1)
+    return order[np.maximum.reduceat(position, starts)]
+
+
+class _SortedFile:
+    """Int64 datetimes of a file in ascending order, with the file's row
+    positions for a range of them. Files which are already sorted (either
+    way, e.g. newest-first scrapes) are only viewed, not copied or sorted."""
+
+    def __init__(self, dt: np.ndarray):
+        self.n, self.order, self.reverse = len(dt), None, False
+        if (dt[1:] >= dt[:-1]).all():
+            self.dt = dt
+        elif (dt[1:] <= dt[:-1]).all():
+            self.dt, self.reverse = dt[::-1], True
+        else:
+            self.order = np.argsort(dt, kind="stable")
+            self.dt = dt[self.order]
+
+    def rows(self, a: int, b: int) -> np.ndarray:
+        """File row positions, in file order, of the sorted datetimes `a` to
+        `b`."""
+        if self.order is not None:
+            return np.sort(self.order[a:b])
+        return np.arange(self.n - b, self.n - a) if self.reverse else np.arange(a, b)
+
+
+def merge_blocks(dt: list, chunk_size: int = MERGE_CHUNK):
+    """Generate blocks of a k-way merge of several files' int64 datetimes, as
+    lists of tuples of (file index, row positions). Each block has every row
+    up to a cutoff datetime which hasn't been in a previous block, so all the
+    rows sharing a datetime are in the same block. The cutoff is the smallest
+    of the datetimes `chunk_size` rows ahead in each file, so a block has at
+    most `chunk_size` rows from each file (plus any sharing the cutoff)."""
+    files = [_SortedFile(d) for d in dt]
+    position = [0] * len(files)
+    while True:
+        live = [i for i, f in enumerate(files) if position[i] < f.n]
+        if not live:
+            return
+        cutoff = min(files[i].dt[min(position[i] + chunk_size, files[i].n) - 1] for i in live)
+        block = list()
+        for i in live:
+            end = int(np.searchsorted(files[i].dt, cutoff, side="right"))
+            block.append((i, files[i].rows(position[i], end)))
+            position[i] = end
+        yield block
+
+
+def fxpair_name(pair: object) -> str:
+    """Name used for the files of a currency pair, e.g. `(GBP, JPY)`, from a
+    tuple of currencies or a pair name."""
+    if isinstance(pair, str):
+        pair = [c.strip(" ()'\"") for c in pair.split(",")]
+    from_symbol, to_symbol = [str.upper(c) for c in pair]
+    return f"({from_symbol}, {to_symbol})"
 
 
 class CSVLoader:
@@ -16,49 +135,322 @@ class CSVLoader:
 
     @staticmethod
     def load_by_symbol(*sym: str, src: str = None, subdir: str = None,
-                       precision: float = 5):
-        """Load a DataFrame of stocks for the specified symbols."""
+                       precision: float = 5, start: object = None,
+                       end: object = None, cache: bool = False,
+                       n_jobs: int = None):
+        """Load a DataFrame of stocks for the specified symbols, optionally only
+        including data between the `start` and `end` datetimes.
+
+        Args:
+            sym: stock symbols to load, defaults to the master symbols list.
+            src: registered data source.
+            subdir: endpoint directory of the scraped data.
+            precision: number of decimal places to round prices to.
+            start: only load data on/after this datetime.
+            end: only load data on/before this datetime.
+            cache: keep each symbol's loaded data in memory, and re-use it until
+                the symbol's catalog checksum changes.
+            n_jobs: number of threads to load symbols with in parallel.
+        """
         src = validate_source(src)
 
         if not subdir:
             subdir = DEFAULT_SUBDIR
 
-        directory = io_path("scraped_data", validate_source(src), subdir)
+        if not sym:
+            sym = MasterSymbols.get()  # Loads entire master symbols list.
+
+        start, end = parse_datetime(start), parse_datetime(end)
+        files = CSVLoader._files_by_name(*{str.upper(s) for s in sym}, src=src, subdir=subdir, start=start,
+                                         end=end, kind="symbols")
+        if not files:
+            return
+
+        def load(*fp, start=None, end=None):
+            return CSVLoader._load_files(*fp, src=src, precision=precision, start=start, end=end)
+
+        df = CSVLoader._load_each(files, load, key=("stocks", src, subdir, precision), start=start, end=end,
+                                  cache=cache, n_jobs=n_jobs)
+        df = apply_categories(df, get_schema(src))
+
+        # Adjust open/low/high prices if necessary:
+        CSVLoader.adjust_prices(df)
+
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def load_by_fxpair(*pair: object, src: str = None, subdir: str = None,
+                       precision: float = 5, start: object = None,
+                       end: object = None, cache: bool = False,
+                       n_jobs: int = None):
+        """Load a DataFrame of FX data for the specified currency pairs, which
+        can be tuples like `("GBP", "JPY")` or names like `(GBP, JPY)`,
+        optionally only including data between the `start` and `end` datetimes.
+        Columns are renamed to the standard field names, and the currency pair
+        is in the `pair` column. See `load_by_symbol` for the other arguments.
+        """
+        src = validate_source(src)
+
+        if not subdir:
+            subdir = FX_SUBDIR
+
+        if not pair:
+            pair = Catalog(src=src, subdir=subdir).symbols  # Loads all scraped pairs.
+
+        start, end = parse_datetime(start), parse_datetime(end)
+        files = CSVLoader._files_by_name(*{fxpair_name(p) for p in pair}, src=src, subdir=subdir, start=start,
+                                         end=end, kind="currency pairs")
+        if not files:
+            return
+
+        def load(*fp, start=None, end=None):
+            return CSVLoader._load_fx_files(*fp, src=src, precision=precision, start=start, end=end)
+
+        df = CSVLoader._load_each(files, load, key=("fx", src, subdir, precision), start=start, end=end,
+                                  cache=cache, n_jobs=n_jobs)
+        return apply_categories(df, get_fx_schema(src)).reset_index(drop=True)
+
+    @staticmethod
+    def _files_by_name(*name: str, src: str, subdir: str,
+                       start: datetime.datetime = None,
+                       end: datetime.datetime = None,
+                       kind: str = "symbols") -> dict:
+        """Dict of each symbol (or pair) name with data to a tuple of its files
+        and catalog checksum. Each name's files are its base CSV plus any
+        segments from more recent scrapes which haven't been compacted into the
+        base file yet. Names without data between `start` and `end` are
+        skipped without opening their files."""
+        directory = io_path("scraped_data", src, subdir)
         assert os.path.isdir(directory), f"No data directory: {directory}"
-        csvs = os.listdir(directory)
+        catalog = Catalog(src=src, subdir=subdir)
+        entries = catalog.get()
+
+        files, missing = dict(), list()
+        for n in sorted(name):
+            entry = entries.get(n)
+            if entry is None:  # Data may have been saved without updating the catalog:
+                entry = catalog.refresh(n)
+            if not entry:
+                missing.append(n)
+                continue
+            first, last = entry_coverage(entry)
+            if (start and last < start) or (end and first > end):
+                continue  # No data in the date range so no need to open the files.
+            base_fp = os.path.join(directory, f"{n}.csv")
+            fp = [base_fp] if os.path.exists(base_fp) else list()
+            if entry.get("segments"):
+                fp += list_segments(n, src=src, subdir=subdir)
+            files[n] = (fp, entry["checksum"])
+        if missing:
+            warnings.warn(f"No data available for {kind}: {', '.join(missing)}")
+        return files
+
+    @staticmethod
+    def _load_each(files: dict, load: callable, key: tuple,
+                   start: datetime.datetime = None,
+                   end: datetime.datetime = None, cache: bool = False,
+                   n_jobs: int = None) -> pd.DataFrame:
+        """Load each name's files with `load` and concatenate them in order of
+        name. Without caching the date range is applied as the files are read;
+        cached data is stored for the whole date range and filtered after."""
+        def load_one(name):
+            fp, checksum = files[name]
+            if not cache:
+                return load(*fp, start=start, end=end)
+            cached = _LOADED.get(key + (name,))
+            if cached is None or cached[0] != checksum:
+                cached = (checksum, load(*fp))
+                _LOADED[key + (name,)] = cached
+            df = cached[1]
+            if start:
+                df = df.loc[df["datetime"] >= start]
+            if end:
+                df = df.loc[df["datetime"] <= end]
+            return df
+
+        names = sorted(files)
+        if n_jobs and n_jobs > 1 and len(names) > 1:
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                frames = list(pool.map(load_one, names))
+        else:
+            frames = [load_one(n) for n in names]
+        return pd.concat(frames, sort=False)
+
+    @staticmethod
+    def clear_cache():
+        """Remove all data kept in memory by loading with `cache=True`."""
+        _LOADED.clear()
+
+    @staticmethod
+    def _load_files(*fp: str, src: str = None, precision: float = 5,
+                    start: datetime.datetime = None,
+                    end: datetime.datetime = None):
+        """Read, clean and de-dupe scraped CSV files into a single DataFrame with
+        the standard field names. Each file is cleaned separately and the files
+        are then merged in blocks (see `merge_by_request_time`)."""
+        schema = get_schema(src)
+        file_schema = expand_schema(schema, get_fieldmap(src))
+        dfs = list()
+        for f in fp:
+            df = read_schema_csv(f, file_schema)
+            df["datetime"] = parse_datetime_column(df["datetime"], schema["datetimes"].get("datetime"))
+            if start:
+                df = df.loc[df["datetime"] >= start]
+            if end:
+                df = df.loc[df["datetime"] <= end]
+            df = df.round(precision).drop_duplicates()
+
+            # Convert field names to the standard names and clean the data:
+            df = apply_fieldmap(df.reset_index(drop=True), src=src)
+            dfs.append(CSVLoader.clean_dataset(df, src=src))
+        return apply_categories(CSVLoader.merge_by_request_time(dfs), schema)
+
+    @staticmethod
+    def resample(*sym: str, freq: str, src: str = None, subdir: str = None,
+                 precision: float = 5, start: object = None,
+                 end: object = None):
+        """Load a DataFrame of OHLC bars of frequency `freq` (e.g. `W`, `1H`) for
+        the specified symbols, optionally only including bars between the
+        `start` and `end` datetimes. Bars are cached per symbol and frequency,
+        and rebuilt when the symbol's catalog checksum changes."""
+        src = validate_source(src)
+        if not subdir:
+            subdir = DEFAULT_SUBDIR
+        catalog = Catalog(src=src, subdir=subdir)
+        entries = catalog.get()
+        cache = BarCache(io_path("bars", src, subdir, make_subdirs=True), freq)
+        start, end = parse_datetime(start), parse_datetime(end)
 
         if not sym:
             sym = MasterSymbols.get()  # Loads entire master symbols list.
 
-        targets = [f"{str.upper(s)}.csv" for s in sym]
-        to_load = sorted(set(csvs) & set(targets))
-        missing = sorted(set(targets) - set(to_load))
+        bars, missing = list(), list()
+        for s in sorted({str.upper(s) for s in sym}):
+            entry = entries.get(s) or catalog.refresh(s)
+            if not entry:
+                missing.append(s)
+                continue
+            load = lambda: CSVLoader.load_by_symbol(s, src=src, subdir=subdir, precision=precision)
+            bars.append(cache.get(s, entry["checksum"], load))
         if missing:
-            missing = [m[:-4] for m in missing]
             warnings.warn(f"No data available for symbols: {', '.join(missing)}")
-        if not to_load:
+        if not bars:
             return
 
+        df = pd.concat(bars, sort=False)
+        if start:
+            df = df.loc[df["datetime"] >= start]
+        if end:
+            df = df.loc[df["datetime"] <= end]
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def missing_dates(*sym: str, src: str = None, subdir: str = None,
+                      freq: str = "B") -> pd.DataFrame:
+        """DataFrame with columns `symbol` and `date` of the dates expected
+        every `freq` (business days by default) which are missing from each
+        symbol's data between its first and last dates. Results are cached per
+        symbol until the symbol's catalog checksum changes."""
+        src = validate_source(src)
+        if not subdir:
+            subdir = DEFAULT_SUBDIR
+        catalog = Catalog(src=src, subdir=subdir)
+        entries = catalog.get()
+        fp = os.path.join(io_path("gaps", src, subdir, make_subdirs=True), "missing_dates.yaml")
+        cache = load_yaml(fp) if os.path.exists(fp) else None
+        cache = dict() if not cache else cache
+        freq_cache = cache.setdefault(freq, dict())
+
+        if not sym:
+            sym = catalog.symbols
+
+        rows, changed = list(), False
+        for s in sorted({str.upper(s) for s in sym}):
+            entry = entries.get(s) or catalog.refresh(s)
+            if not entry:
+                continue
+            cached = freq_cache.get(s)
+            if not cached or cached["checksum"] != entry["checksum"]:
+                df = CSVLoader.load_by_symbol(s, src=src, subdir=subdir)
+                dates = missing_days(df["datetime"], freq=freq)
+                cached = {"checksum": entry["checksum"], "dates": [d.strftime("%Y-%m-%d") for d in dates]}
+                freq_cache[s], changed = cached, True
+            rows.extend((s, d) for d in cached["dates"])
+        if changed:
+            save_yaml(cache, fp)
+
+        df = pd.DataFrame(rows, columns=["symbol", "date"])
+        df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+        return df
+
+    @staticmethod
+    def _load_fx_files(*fp: str, src: str = None, precision: float = 5,
+                       start: datetime.datetime = None,
+                       end: datetime.datetime = None):
+        """Read and de-dupe scraped FX CSV files into a single DataFrame with
+        the standard field names."""
+        schema = get_fx_schema(src)
+        file_schema = expand_schema(schema, FX_FIELDMAP)
         dfs = list()
-        for csv in to_load:
-            fp = os.path.join(directory, csv)
-            new = pd.read_csv(fp, encoding="utf-8")
-            dfs.append(new)
-        df = pd.concat(dfs, sort=False)
-        df["datetime"] = pd.to_datetime(df["datetime"])
-        df = df.round(precision).drop_duplicates()
+        for f in fp:
+            # Compacted files are saved with the standard names, so merge them with any raw names:
+            df = merge_dupe_cols(read_schema_csv(f, file_schema).rename(columns={v: k for k, v in FX_FIELDMAP.items()}))
+            df["datetime"] = parse_datetime_column(df["datetime"], schema["datetimes"].get("datetime"))
+            if start:
+                df = df.loc[df["datetime"] >= start]
+            if end:
+                df = df.loc[df["datetime"] <= end]
+            df = df.round(precision).drop_duplicates()
+            for col, dtype in schema["dtypes"].items():
+                if col in df.columns:
+                    df[col] = df[col].astype(dtype)
+            dfs.append(df.reset_index(drop=True))
+        return apply_categories(CSVLoader.merge_by_request_time(dfs, group_col="pair"), schema)
 
-        # Convert field names to the standard names:
-        df = apply_fieldmap(df.reset_index(drop=True), src=src)
+    @staticmethod
+    def compact(sym: str, src: str = None, subdir: str = None,
+                precision: float = 5) -> int:
+        """Merge all scrape segments saved for a symbol into its base CSV file
+        and delete the segments. Returns the number of segments compacted."""
+        src = validate_source(src)
+        if not subdir:
+            subdir = DEFAULT_SUBDIR
+        sym = str.upper(sym)
 
-        # Clean and de-dupe data:
-        df = CSVLoader.clean_dataset(df, src=src)
-        df = CSVLoader.dedupe_by_request_time(df)
+        def load(*fp):
+            return CSVLoader._load_files(*fp, src=src, precision=precision)
 
-        # Adjust open/low/high prices if necessary:
-        CSVLoader.adjust_prices(df)
+        return CSVLoader._compact(sym, load, src=src, subdir=subdir)
 
-        return df.reset_index(drop=True)
+    @staticmethod
+    def compact_fxpair(pair: object, src: str = None, subdir: str = None,
+                       precision: float = 5) -> int:
+        """Merge all scrape segments saved for a currency pair into its base CSV
+        file and delete the segments. Returns the number of segments compacted.
+        """
+        src = validate_source(src)
+        if not subdir:
+            subdir = FX_SUBDIR
+
+        def load(*fp):
+            return CSVLoader._load_fx_files(*fp, src=src, precision=precision)
+
+        return CSVLoader._compact(fxpair_name(pair), load, src=src, subdir=subdir)
+
+    @staticmethod
+    def _compact(name: str, load: callable, src: str, subdir: str) -> int:
+        segments = list_segments(name, src=src, subdir=subdir)
+        if not segments:
+            return 0
+        fp = io_path("scraped_data", src, subdir, filename=f"{name}.csv")
+        files = [fp] + segments if os.path.exists(fp) else segments
+        df = load(*files)
+        df["request_time"] = df["request_time"].dt.strftime(SECOND_FORMAT)
+        atomic_to_csv(df, fp)
+        for segment in segments:
+            os.remove(segment)
+        Catalog(src=src, subdir=subdir).record_base(name, df, fp)
+        return len(segments)
 
     @staticmethod
     def clean_dataset(df: pd.DataFrame, src: str = None):
@@ -69,6 +461,7 @@ class CSVLoader:
         src = validate_source(src)
         df = merge_dupe_cols(df)
         fieldmap = get_fieldmap(src)
+        schema = get_schema(src)
 
         # Merge any duplicate standard/custom field columns, keeping only the specified column:
         for keep_col, drop_col in fieldmap.items():
@@ -80,29 +473,61 @@ class CSVLoader:
         df = df[[c for c in df.columns if c not in drop_cols]]
 
         # Fix data types:
-        df["datetime"] = pd.to_datetime(df["datetime"])
+        df["datetime"] = parse_datetime_column(df["datetime"], schema["datetimes"].get("datetime"))
         df["symbol"] = df["symbol"].astype(str).str.upper()
         float_cols = [k for k in fieldmap.keys() if k not in ("datetime", "symbol")]
         for f_col in float_cols:
-            df[f_col] = df[f_col].astype(float)
+            df[f_col] = df[f_col].astype(schema["dtypes"].get(f_col, float))
 
-        return df
+        return apply_categories(df, schema)
+
+    @staticmethod
+    def _fill_request_time(df: pd.DataFrame):
+        """Parse the request time column, filling it in for data scraped before
+        request times were saved."""
+        default_request_time = datetime.datetime.strptime("2020_01_01 00;00;00", SECOND_FORMAT)
+        if "request_time" not in df.columns:
+            df["request_time"] = default_request_time
+        df["request_time"] = parse_request_time(df["request_time"]).fillna(default_request_time)
 
     @staticmethod
-    def dedupe_by_request_time(df: pd.DataFrame):
+    def dedupe_by_request_time(df: pd.DataFrame, group_col: str = "symbol"):
         """If a symbol has been scraped multiple times in a date period then
         there may be duplicate rows of data for a single period, which will
         cause errors in analysis. This deduplicates the rows, leaving the most
-        recently scraped data in place.
+        recently scraped data in place (ties on request time are broken by the
+        largest volume). Rows are returned sorted by `group_col` (e.g. symbol or
+        currency pair) and datetime.
         """
-        sort_cols = ["datetime", "request_time", "volume"]
-        default_request_time = "2020_01_01 00;00;00"
-        if "request_time" not in df.columns:
-            df["request_time"] = default_request_time
-        df["request_time"] = df["request_time"].fillna(default_request_time)
-        df["request_time"] = pd.to_datetime(df["request_time"], format=SECOND_FORMAT)
-        df.sort_values(by=sort_cols, ascending=True, inplace=True)
-        return df.drop_duplicates(subset=["datetime"], keep="last")
+        CSVLoader._fill_request_time(df)
+        groups = pd.factorize(df[group_col])[0] if group_col in df.columns else None
+        tiebreak = df["volume"].to_numpy(dtype=float) if "volume" in df.columns else None
+        rows = latest_rows(df["datetime"], df["request_time"], groups=groups, tiebreak=tiebreak)
+        return df.iloc[rows]
+
+    @staticmethod
+    def merge_by_request_time(dfs: list, group_col: str = "symbol",
+                              chunk_size: int = MERGE_CHUNK):
+        """Merge DataFrames read from several files of the same symbol (or
+        pair), de-duping them like `dedupe_by_request_time`. The files are
+        merged block by block (see `merge_blocks`), so only a block of up to
+        `chunk_size` rows per file is sorted and de-duped at a time rather
+        than every row of every file at once. Rows are returned sorted by
+        datetime, or by `group_col` and datetime if the files hold several.
+        """
+        for df in dfs:
+            CSVLoader._fill_request_time(df)
+        if not any(len(df) for df in dfs):
+            return pd.concat(dfs, sort=False)
+        dfs = [df for df in dfs if len(df)]
+        if group_col in dfs[0].columns and len(set().union(*(df[group_col].unique() for df in dfs))) > 1:
+            # Blocks are cut on datetime alone, so de-dupe several groups in one go:
+            return CSVLoader.dedupe_by_request_time(pd.concat(dfs, sort=False), group_col=group_col)
+        blocks = list()
+        for block in merge_blocks([_as_int64(df["datetime"]) for df in dfs], chunk_size=chunk_size):
+            df = pd.concat([dfs[i].iloc[rows] for i, rows in block], sort=False)
+            blocks.append(CSVLoader.dedupe_by_request_time(df, group_col=group_col))
+        return pd.concat(blocks, sort=False)
 
     @staticmethod
     def rows_need_adjusting(df: pd.DataFrame, precision: int = 5):
@@ -0,0 +1,140 @@
+"""Memory-mapped cube of daily price data for a universe of symbols. The data
+scraped from a source endpoint (by default `TIME_SERIES_DAILY_ADJUSTED`) is
+converted once into a float64 array with shape (symbol, date, field), saved in
+`cubes/<src>/<endpoint>` with a CSV file indexing the symbols and an array of
+the dates. Opening the cube only maps the files into memory, so any number of
+processes can share it read-only, and a symbol, date or field is sliced from it
+by position without loading or pivoting the per-symbol CSV files."""
+
+import numpy as np
+import os
+import pandas as pd
+
+from thales.config.cache import load_yaml, save_yaml
+from thales.config.paths import io_path
+from thales.config.sources import validate_source
+from thales.data.catalog import Catalog
+from thales.data.csv_loader import CSVLoader
+
+
+CUBE_FIELDS = ("open", "high", "low", "close", "raw_close", "volume")
+CUBE_SUBDIR = "TIME_SERIES_DAILY_ADJUSTED"
+
+_OPEN_CUBES = dict()  # Maps cube directory to tuple of (mtime_ns, OHLCVCube).
+
+
+def cube_dir(src: str = None, subdir: str = None, make_subdirs: bool = False) -> str:
+    """Path to the directory storing the cube for a source endpoint."""
+    subdir = CUBE_SUBDIR if not subdir else subdir
+    return io_path("cubes", validate_source(src), subdir, make_subdirs=make_subdirs)
+
+
+class OHLCVCube:
+    """Read-only memory-mapped (symbol, date, field) array of daily data."""
+
+    def __init__(self, src: str = None, subdir: str = None):
+        self.src = validate_source(src)
+        self.subdir = CUBE_SUBDIR if not subdir else subdir
+        self.directory = cube_dir(self.src, self.subdir)
+        self.meta = load_yaml(os.path.join(self.directory, "meta.yaml"))
+        self.fields = self.meta["fields"]
+        self.symbols = pd.read_csv(os.path.join(self.directory, "symbols.csv"), encoding="utf-8")["symbol"].tolist()
+        dates = np.load(os.path.join(self.directory, "dates.npy"), mmap_mode="r")
+        self.dates = pd.DatetimeIndex(dates.view("datetime64[ns]"), name="datetime")
+        self.values = np.load(os.path.join(self.directory, "values.npy"), mmap_mode="r")
+        self._symbol_ix = {s: i for i, s in enumerate(self.symbols)}
+        self._date_ix = {d: i for i, d in enumerate(dates.tolist())}
+        self._field_ix = {f: i for i, f in enumerate(self.fields)}
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    @staticmethod
+    def build(*sym: str, src: str = None, subdir: str = None,
+              fields: tuple = None) -> "OHLCVCube":
+        """Build the cube from the scraped data of all the symbols in the
+        endpoint's catalog, or only the symbols passed."""
+        src = validate_source(src)
+        subdir = CUBE_SUBDIR if not subdir else subdir
+        fields = list(CUBE_FIELDS if fields is None else fields)
+        catalog = Catalog(src=src, subdir=subdir)
+        entries = catalog.get()
+        sym = sorted({str.upper(s) for s in sym}) if sym else sorted(entries)
+        df = CSVLoader.load_by_symbol(*sym, src=src, subdir=subdir)
+        assert df is not None and len(df), f"No data to build cube for {src}/{subdir}"
+        fields = [f for f in fields if f in df.columns]
+
+        # Every row's position in the cube:
+        symbols = sorted(df["symbol"].astype(str).unique())
+        dt = df["datetime"].to_numpy(dtype="datetime64[ns]").view("i8")
+        dates = np.unique(dt)
+        symbol_pos = pd.Categorical(df["symbol"].astype(str), categories=symbols).codes
+        date_pos = np.searchsorted(dates, dt)
+
+        directory = cube_dir(src, subdir, make_subdirs=True)
+        meta_fp = os.path.join(directory, "meta.yaml")
+        if os.path.exists(meta_fp):
+            os.remove(meta_fp)
+
+        # Arrays are written to temporary files and then replace any old ones,
+        # so processes which still have the old cube mapped aren't affected:
+        values_fp, dates_fp = os.path.join(directory, "values.npy"), os.path.join(directory, "dates.npy")
+        values = np.lib.format.open_memmap(f"{values_fp}.tmp", mode="w+", dtype="float64",
+                                           shape=(len(symbols), len(dates), len(fields)))
+        values[:] = np.nan
+        values[symbol_pos, date_pos] = df[fields].to_numpy(dtype="float64")
+        values.flush()
+        del values
+        np.save(f"{dates_fp}.tmp.npy", dates)
+        os.replace(f"{values_fp}.tmp", values_fp)
+        os.replace(f"{dates_fp}.tmp.npy", dates_fp)
+        pd.DataFrame({"symbol": symbols}).to_csv(os.path.join(directory, "symbols.csv"), encoding="utf-8",
+                                                 index=False)
+
+        # The meta file is written last, so a cube only opens once it's complete:
+        checksums = {s: entries[s]["checksum"] for s in symbols if s in entries}
+        save_yaml({"fields": fields, "checksums": checksums}, meta_fp)
+        return open_cube(src, subdir)
+
+    def is_stale(self) -> bool:
+        """True if any symbol's data has changed since the cube was built."""
+        entries = Catalog(src=self.src, subdir=self.subdir).get()
+        checksums = self.meta["checksums"]
+        return any(entries.get(s, dict()).get("checksum") != c for s, c in checksums.items())
+
+    def symbol(self, sym: str) -> pd.DataFrame:
+        """DataFrame of a symbol's data indexed by date, as a view of the cube."""
+        i = self._symbol_ix[str.upper(sym)]
+        return pd.DataFrame(self.values[i], index=self.dates, columns=self.fields, copy=False)
+
+    def date(self, dt: object) -> pd.DataFrame:
+        """DataFrame of every symbol's data on a date, as a view of the cube."""
+        j = self._date_ix[pd.Timestamp(dt).value]
+        return pd.DataFrame(self.values[:, j], index=pd.Index(self.symbols, name="symbol"), columns=self.fields,
+                            copy=False)
+
+    def field(self, field: str, start: object = None,
+              end: object = None) -> pd.DataFrame:
+        """DataFrame of a field indexed by date with a column for each symbol
+        (i.e. the pivot of the long data), optionally between two dates."""
+        i = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        j = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        k = self._field_ix[field]
+        return pd.DataFrame(self.values[:, i:j, k].T, index=self.dates[i:j],
+                            columns=pd.Index(self.symbols, name="symbol"), copy=False)
+
+
+def open_cube(src: str = None, subdir: str = None):
+    """Open the cube for a source endpoint, or return None if it hasn't been
+    built. Cubes are cached so each one is only mapped once per process."""
+    directory = cube_dir(src, subdir)
+    meta_fp = os.path.join(directory, "meta.yaml")
+    if not os.path.exists(meta_fp):
+        return None
+    mtime = os.stat(meta_fp).st_mtime_ns
+    cached = _OPEN_CUBES.get(directory)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, OHLCVCube(src, subdir))
+        _OPEN_CUBES[directory] = cached
+    return cached[1]
@@ -0,0 +1,112 @@
+"""Columnar store of the features and labels computed by `MLDataset`, saved in
+`features/<src>/<endpoint>/<symbol>`. Each column is a float64 `.npy` file
+named by a hash of the column name, with the datetimes it's indexed by saved
+once per distinct index. A manifest maps every column to its files, the spec
+it was computed from (e.g. the indicator, price column and parameters) and the
+version of the symbol's data it was computed from (its catalog checksum and the
+price precision), so columns are only re-used while the data is unchanged, and
+any subset of them can be loaded without reading the rest. Symbols without a
+catalog checksum have no known version, so their columns are never stored or
+loaded."""
+
+import hashlib
+import numpy as np
+import os
+import pandas as pd
+import warnings
+
+from thales.config.cache import load_yaml, save_yaml
+from thales.config.paths import io_path
+from thales.config.sources import validate_source
+from thales.config.utils import DEFAULT_SUBDIR
+from thales.data.catalog import Catalog
+
+
+def spec_key(feature: str, **spec) -> str:
+    """String key of a feature spec, e.g. `sma|n=5|ohlct=c`."""
+    values = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in spec.items()}
+    return "|".join([feature] + [f"{k}={values[k]}" for k in sorted(values)])
+
+
+def _hash(s: str) -> str:
+    return hashlib.md5(s.encode()).hexdigest()[:16]
+
+
+class FeatureStore:
+    """Stored feature and label columns of a symbol."""
+
+    def __init__(self, sym: str, src: str = None, subdir: str = None,
+                 precision: float = 5):
+        self.sym = sym.upper()
+        self.src = validate_source(src)
+        self.subdir = DEFAULT_SUBDIR if not subdir else subdir
+        self.directory = io_path("features", self.src, self.subdir, self.sym)
+        self.manifest_fp = os.path.join(self.directory, "manifest.yaml")
+        entry = Catalog(src=self.src, subdir=self.subdir).entry(self.sym) or dict()
+        self.version = f"{entry['checksum']}:{precision}" if entry.get("checksum") else None
+
+    @property
+    def manifest(self) -> dict:
+        """Dict mapping column name to a dict of its `file`, `index` file,
+        `spec`, `kind` (feature or label) and data `version`."""
+        if not os.path.exists(self.manifest_fp):
+            return dict()
+        return load_yaml(self.manifest_fp) or dict()
+
+    def fresh(self, *columns: str) -> dict:
+        """Manifest entries of the columns computed from the current version of
+        the symbol's data, optionally only for the columns passed."""
+        if self.version is None:
+            return dict()
+        manifest = self.manifest
+        columns = columns if columns else manifest
+        return {c: manifest[c] for c in columns if c in manifest and manifest[c]["version"] == self.version}
+
+    def save(self, df: pd.DataFrame, specs: dict, kind: str = "feature"):
+        """Save the columns of a DataFrame, with a dict mapping each column
+        name to the spec key it was computed from."""
+        self.save_arrays(df.index, {c: df[c].to_numpy() for c in df.columns}, specs, kind=kind)
+
+    def save_arrays(self, index: pd.DatetimeIndex, columns: dict, specs: dict,
+                    kind: str = "feature"):
+        """Save a dict mapping column names to arrays of values indexed by
+        `index` (e.g. memory-mapped arrays of columns which aren't in memory)."""
+        if not columns:
+            return
+        if self.version is None:
+            warnings.warn(f"No catalog checksum for {self.sym}, so its features can't be versioned and aren't "
+                          f"stored.")
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        dt = index.to_numpy(dtype="datetime64[ns]").view("i8")
+        index_file = f"index_{hashlib.md5(dt.tobytes()).hexdigest()[:16]}.npy"
+        index_fp = os.path.join(self.directory, index_file)
+        if not os.path.exists(index_fp):
+            np.save(f"{index_fp}.tmp.npy", dt)
+            os.replace(f"{index_fp}.tmp.npy", index_fp)
+
+        manifest = self.manifest
+        for c, values in columns.items():
+            file = f"{_hash(c)}.npy"
+            fp = os.path.join(self.directory, file)
+            np.save(f"{fp}.tmp.npy", np.asarray(values, dtype="float64"))
+            os.replace(f"{fp}.tmp.npy", fp)
+            manifest[c] = {"file": file, "index": index_file, "spec": specs.get(c, c), "kind": kind,
+                           "version": self.version}
+        save_yaml(manifest, self.manifest_fp)
+
+    def load(self, *columns: str, index: pd.DatetimeIndex = None) -> dict:
+        """Load fresh columns (all of them if none are passed), returning a dict
+        mapping kind to a DataFrame of the columns of that kind. Columns are
+        reindexed to `index` if it's passed."""
+        entries = self.fresh(*columns)
+        indexes, frames = dict(), {"feature": dict(), "label": dict()}
+        for c, entry in entries.items():
+            if entry["index"] not in indexes:
+                dt = np.load(os.path.join(self.directory, entry["index"]))
+                indexes[entry["index"]] = pd.DatetimeIndex(dt.view("datetime64[ns]"), name="datetime")
+            s = pd.Series(np.load(os.path.join(self.directory, entry["file"])), index=indexes[entry["index"]],
+                          name=c)
+            frames[entry["kind"]][c] = s if index is None or s.index.equals(index) else s.reindex(index)
+        return {k: pd.DataFrame(v, index=index) for k, v in frames.items() if v}
@@ -0,0 +1,146 @@
+"""Columnar buffer for building a matrix of features. Columns are written into
+one preallocated float64 array laid out with a row per feature, which is the
+layout pandas stores a block of float columns in, so the finished matrix is
+converted into a DataFrame once without copying, rather than inserting each
+feature into a DataFrame and fragmenting it into one block per column. Arrays
+are passed between processes building features in parallel through shared
+memory with `share_array` and `attach_array`, rather than being pickled."""
+
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import pandas as pd
+import time
+import tracemalloc
+
+
+class FeatureMatrix:
+    """Preallocated float64 feature columns sharing an index, with a registry
+    mapping each column name to its position."""
+
+    def __init__(self, index: pd.Index, capacity: int = 16):
+        self.index = index
+        self.columns = dict()  # Maps column name to its row in `_values`.
+        self._values = np.empty((max(int(capacity), 1), len(index)), dtype="float64")
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __contains__(self, name: str):
+        return name in self.columns
+
+    @property
+    def capacity(self) -> int:
+        return self._values.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the columns added."""
+        return len(self) * len(self.index) * self._values.itemsize
+
+    @property
+    def values(self) -> np.ndarray:
+        """View of the columns added, with a row per column."""
+        return self._values[:len(self)]
+
+    def _grow(self, n: int):
+        """Reallocate the buffer to hold at least `n` columns."""
+        values = np.empty((max(n, 2 * self.capacity), len(self.index)), dtype="float64")
+        values[:len(self)] = self._values[:len(self)]
+        self._values = values
+
+    def add(self, name: str, values: object):
+        """Add a column, aligning a Series to the index if it has a different
+        index. Columns which have already been added are ignored."""
+        if name in self.columns:
+            return
+        if isinstance(values, pd.Series) and not values.index.equals(self.index):
+            values = values.reindex(self.index)
+        if len(self) == self.capacity:
+            self._grow(len(self) + 1)
+        self._values[len(self)] = np.asarray(values, dtype="float64")
+        self.columns[name] = len(self)
+
+    def add_rows(self, name: str, values: np.ndarray, rows: np.ndarray):
+        """Add a column of `values` at the row positions `rows` and NaN in the
+        other rows, written straight into the buffer."""
+        if name in self.columns:
+            return
+        if len(self) == self.capacity:
+            self._grow(len(self) + 1)
+        column = self._values[len(self)]
+        column.fill(np.nan)
+        column[rows] = values
+        self.columns[name] = len(self)
+
+    def add_frame(self, df: pd.DataFrame):
+        """Add every column of a DataFrame."""
+        if not df.index.equals(self.index):
+            df = df.reindex(self.index)
+        new = [c for c in df.columns if c not in self.columns]
+        if len(self) + len(new) > self.capacity:
+            self._grow(len(self) + len(new))
+        for c in new:
+            self.add(c, df[c].to_numpy(dtype="float64"))
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame of the columns added, as a view of the buffer."""
+        return pd.DataFrame(self._values[:len(self)].T, index=self.index, columns=list(self.columns), copy=False)
+
+    def flush(self) -> pd.DataFrame:
+        """DataFrame of the columns added (see `to_frame`), after which the
+        matrix is emptied into a new buffer, with the capacity which was left,
+        so more columns can be added."""
+        df = self.to_frame()
+        self._values = np.empty((max(self.capacity - len(self), 1), len(self.index)), dtype="float64")
+        self.columns = dict()
+        return df
+
+
+def share_array(a: np.ndarray, track: bool = True) -> tuple:
+    """Copy an array into a new block of shared memory. Returns the block and
+    a picklable `(name, shape, dtype)` tuple for attaching to it from another
+    process with `attach_array`. Blocks created with `track` False are left for
+    the process which attaches to them to unlink."""
+    block = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+    if not track:
+        resource_tracker.unregister(block._name, "shared_memory")
+    np.ndarray(a.shape, dtype=a.dtype, buffer=block.buf)[:] = a
+    return block, (block.name, a.shape, a.dtype.str)
+
+
+def attach_array(spec: tuple) -> tuple:
+    """Attach to an array in shared memory, returning the block and a view of
+    the array (which is only valid until the block is closed)."""
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+class BuildReport:
+    """Context manager recording the wall time and the peak memory allocated
+    (as traced by `tracemalloc`) while building features."""
+
+    def __init__(self):
+        self.seconds = None
+        self.peak_mb = None
+        self._start = None
+        self._tracing = False
+
+    def __enter__(self):
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self.peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        if self._tracing:
+            tracemalloc.stop()
+        return False
+
+    def to_dict(self) -> dict:
+        return {"seconds": self.seconds, "peak_mb": self.peak_mb}
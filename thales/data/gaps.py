@@ -0,0 +1,59 @@
+"""Vectorised detection of gaps and duplicates in price data. `day_report`
+summarises intraday data in one pass over its sorted timestamps, with a row for
+each day which has data giving its number of rows, duplicated timestamps,
+missing periods and longest gap, plus a bitmask of the hours which have data.
+Days or sessions without any data are then found from the report, e.g. with
+`missing_days` and `window_days`."""
+
+import numpy as np
+import pandas as pd
+
+from thales.data.sessions import SessionIndex
+
+
+REPORT_COLS = ("first", "last", "rows", "duplicates", "missing", "max_gap", "hours")
+
+
+def day_report(index: object, freq: str = "1min") -> pd.DataFrame:
+    """DataFrame with a row for each day in a sorted index of datetimes which
+    are expected every `freq`. Columns are the first and last datetime of the
+    day, the number of rows, the number of duplicated datetimes, the number of
+    missing periods between the first and last datetime, the longest gap in
+    periods, and a bitmask of the hours with data (bit `h` for hour `h`)."""
+    sessions = SessionIndex(index)
+    dt = pd.DatetimeIndex(index).to_numpy(dtype="datetime64[ns]").view("i8")
+    if not len(dt):
+        return pd.DataFrame(columns=list(REPORT_COLS), index=sessions.days)
+    step = pd.tseries.frequencies.to_offset(freq).nanos
+    starts = sessions.day_starts
+    ends = np.r_[starts[1:], len(dt)]
+
+    duplicate = np.r_[False, dt[1:] == dt[:-1]]
+    duplicates = np.add.reduceat(duplicate.astype("int64"), starts)
+    rows = ends - starts
+    expected = (dt[ends - 1] - dt[starts]) // step + 1
+    gap = np.r_[0, np.diff(dt) // step - 1]
+    gap[starts] = 0  # Overnight gaps are counted as missing days instead.
+    hours = np.bitwise_or.reduceat(np.left_shift(1, sessions.hours.astype("int64")), starts)
+    return pd.DataFrame({"first": dt[starts].view("datetime64[ns]"), "last": dt[ends - 1].view("datetime64[ns]"),
+                         "rows": rows, "duplicates": duplicates,
+                         "missing": np.maximum(expected - (rows - duplicates), 0),
+                         "max_gap": np.maximum.reduceat(np.maximum(gap, 0), starts), "hours": hours},
+                        index=sessions.days, columns=list(REPORT_COLS))
+
+
+def window_days(report: pd.DataFrame, start_hour: int = 0,
+                end_hour: int = 23) -> pd.DatetimeIndex:
+    """Days in a report with data in the hours `start_hour` to `end_hour`
+    inclusive (e.g. 6 and 7 for 06:00 to 07:59)."""
+    bits = sum(1 << h for h in range(start_hour, end_hour + 1))
+    return report.index[(report["hours"].to_numpy(dtype="int64") & bits) > 0]
+
+
+def missing_days(days: object, freq: str = "B") -> pd.DatetimeIndex:
+    """Dates expected every `freq` (business days by default) between the
+    first and last of `days` which aren't in `days`."""
+    days = pd.DatetimeIndex(days).normalize()
+    if not len(days):
+        return days
+    return pd.date_range(days.min(), days.max(), freq=freq).difference(days)
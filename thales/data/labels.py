@@ -0,0 +1,195 @@
+"""Vectorised labels describing the future of a price series, for a list of
+horizons at once. Rows are processed in chunks, each with the segment of prices
+ahead of it: sums (for means and standard deviations) over the next `n` rows
+are differences of one cumulative sum of the segment, and minimums and maximums
+come from a doubling table which is extended as the horizons get longer, so the
+labels for all the horizons take one pass over the segment rather than a
+rolling window per horizon. Labels for rows whose window runs past the end of
+the data (or contains a NaN) are NaN, matching `s.rolling(n).<func>()` shifted
+`n` rows back. `first_touch` gives triple-barrier labels, comparing a strided
+view of the prices ahead of each row in a chunk with the row's barriers."""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+
+
+LABEL_FUNCS = ("shift", "pc", "min", "max", "mean", "sum", "std", "vol")
+CHUNK_SIZE = 2 ** 16  # Rows per chunk; cumulative sums restart each chunk to limit rounding.
+
+
+def label_name(col: str, func: str, n: int) -> str:
+    """Name of the label column for a price column, label function and horizon."""
+    assert func in LABEL_FUNCS, f"Invalid label function `{func}`, valid options are: {LABEL_FUNCS}"
+    if func == "shift":
+        return f"{col}_n+{n}"
+    elif func == "pc":
+        return f"{col}_n+{n}_pc"
+    return f"{col}_future_{func}_n={n}"
+
+
+def _segment(values: np.ndarray, start: int, stop: int, m: int) -> np.ndarray:
+    """The `m` - 1 + (`stop` - `start`) values after position `start`, padded
+    with NaN past the end, so the window of the next `n` values of row `start`
+    + `r` is `segment[r:r + n]`."""
+    segment = values[start + 1:stop + m]
+    size = stop - start + m - 1
+    if len(segment) < size:
+        segment = np.r_[segment, np.full(size - len(segment), np.nan)]
+    return segment
+
+
+def _pad(a: np.ndarray, n: int) -> np.ndarray:
+    """Shift an array `n` positions left, filling the end with NaN."""
+    return np.r_[a[n:], np.full(n, np.nan)] if n else a
+
+
+def _extremes(segment: np.ndarray, horizons: list, rows: int, func: np.ufunc) -> dict:
+    """Min or max (by `func`) of each row's next `n` values for each horizon.
+    Level `k` of the doubling table holds `func` over windows of width `2**k`,
+    and a window of width `n` is covered by two overlapping windows of the
+    widest level that fits in it."""
+    out = dict()
+    level, width = segment, 1
+    for n in horizons:
+        while 2 * width <= n:
+            level = func(level, _pad(level, width))
+            width *= 2
+        out[n] = func(level[:rows], level[n - width:n - width + rows])
+    return out
+
+
+def _sums(segment: np.ndarray, horizons: list, rows: int, reference: float) -> tuple:
+    """Sums and sums of squares of each row's next `n` values for each horizon,
+    taken relative to `reference` to limit rounding. Sums of windows containing
+    NaNs are NaN."""
+    nan = np.isnan(segment)
+    centred = np.where(nan, 0, segment - reference)
+    total = np.r_[0, np.cumsum(centred)]
+    squares = np.r_[0, np.cumsum(centred ** 2)]
+    nans = np.r_[0, np.cumsum(nan)]
+    sums, sums_sq = dict(), dict()
+    for n in horizons:
+        invalid = nans[n:n + rows] > nans[:rows]
+        sums[n] = np.where(invalid, np.nan, total[n:n + rows] - total[:rows])
+        sums_sq[n] = np.where(invalid, np.nan, squares[n:n + rows] - squares[:rows])
+    return sums, sums_sq
+
+
+def _std(total: np.ndarray, squares: np.ndarray, n: int) -> np.ndarray:
+    """Sample standard deviation from sums, or NaN if `n` < 2."""
+    if n < 2:
+        return np.full(len(total), np.nan)
+    return np.sqrt(np.maximum((squares - total ** 2 / n) / (n - 1), 0))
+
+
+def forward_labels(s: pd.Series, horizons: list, funcs: tuple = ("pc", "min", "max", "mean", "vol"),
+                   chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """DataFrame of labels for each of the `horizons` (numbers of rows) after
+    every row of a price series. Label functions are:
+
+        shift: the price `n` rows ahead.
+        pc: percent change from the price to the price `n` rows ahead.
+        min/max/mean/sum/std: of the prices in the next `n` rows.
+        vol: standard deviation of the percent changes over the next `n` rows.
+    """
+    horizons = sorted({int(n) for n in horizons})
+    assert horizons and horizons[0] > 0, "Horizons must be positive integers"
+    names = {(f, n): label_name(s.name, f, n) for n in horizons for f in funcs}
+    values = s.to_numpy(dtype="float64")
+    out = {k: np.full(len(values), np.nan) for k in names}
+    if "vol" in funcs:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.r_[np.nan, values[1:] / values[:-1] - 1]
+    m = horizons[-1]
+
+    for start in range(0, len(values), chunk_size):
+        stop = min(start + chunk_size, len(values))
+        rows, current = stop - start, values[start:stop]
+        segment = _segment(values, start, stop, m)
+        for n in horizons:
+            if "shift" in funcs:
+                out[("shift", n)][start:stop] = segment[n - 1:n - 1 + rows]
+            if "pc" in funcs:
+                out[("pc", n)][start:stop] = (segment[n - 1:n - 1 + rows] - current) / current
+        for f, func in (("min", np.minimum), ("max", np.maximum)):
+            if f in funcs:
+                for n, v in _extremes(segment, horizons, rows, func).items():
+                    out[(f, n)][start:stop] = v
+        if {"mean", "sum", "std"} & set(funcs):
+            reference = np.nanmean(current) if np.isfinite(current).any() else 0.0
+            sums, squares = _sums(segment, horizons, rows, reference)
+            for n in horizons:
+                if "sum" in funcs:
+                    out[("sum", n)][start:stop] = sums[n] + n * reference
+                if "mean" in funcs:
+                    out[("mean", n)][start:stop] = sums[n] / n + reference
+                if "std" in funcs:
+                    out[("std", n)][start:stop] = _std(sums[n], squares[n], n)
+        if "vol" in funcs:
+            sums, squares = _sums(_segment(returns, start, stop, m), horizons, rows, 0.0)
+            for n in horizons:
+                out[("vol", n)][start:stop] = _std(sums[n], squares[n], n)
+
+    return pd.DataFrame({names[k]: v for k, v in out.items()}, index=s.index, columns=list(names.values()))
+
+
+def _windows(values: np.ndarray, start: int, stop: int, m: int) -> np.ndarray:
+    """Read-only strided view of each row's next `m` values, for the rows in
+    `start:stop`, padded with NaN past the end."""
+    segment = np.ascontiguousarray(_segment(values, start, stop, m))
+    step = segment.strides[0]
+    return as_strided(segment, shape=(stop - start, m), strides=(step, step), writeable=False)
+
+
+def _first(hit: np.ndarray) -> np.ndarray:
+    """Position of the first True in each row, or the row length if none."""
+    return np.where(hit.any(axis=1), hit.argmax(axis=1), hit.shape[1])
+
+
+def first_touch(close: np.ndarray, upper: object, lower: object, n: int,
+                high: np.ndarray = None, low: np.ndarray = None,
+                chunk_size: int = None) -> tuple:
+    """Triple-barrier first touch for every row of a price array: whether the
+    price goes up by `upper` (a fraction), down by `lower`, or neither within
+    the next `n` rows. Barrier widths are scalars or arrays with a width per row
+    (NaN widths give NaN labels; None disables the barrier). If `high` and
+    `low` arrays are passed they are used to detect touches within a period,
+    and when both barriers are touched in the same period the lower one is
+    assumed to have been touched first.
+
+    Returns arrays of the label (1 upper, -1 lower, 0 time limit), the number
+    of periods until the touch (or `n`), and the percent change from the close
+    to the close at the touch. Rows which don't touch a barrier and have less
+    than `n` periods of data after them are NaN.
+    """
+    assert n > 0, "Time limit must be a positive number of periods"
+    close = np.asarray(close, dtype="float64")
+    high = close if high is None else np.asarray(high, dtype="float64")
+    low = close if low is None else np.asarray(low, dtype="float64")
+    size = len(close)
+    upper = np.broadcast_to(np.inf if upper is None else np.asarray(upper, dtype="float64"), (size,))
+    lower = np.broadcast_to(np.inf if lower is None else np.asarray(lower, dtype="float64"), (size,))
+    label, periods, change = np.full(size, np.nan), np.full(size, np.nan), np.full(size, np.nan)
+    chunk_size = max(1, 2 ** 22 // n) if chunk_size is None else chunk_size
+
+    for start in range(0, size, chunk_size):
+        stop = min(start + chunk_size, size)
+        base = close[start:stop, None]
+        with np.errstate(invalid="ignore"):
+            up = _first(_windows(high, start, stop, n) >= base * (1 + upper[start:stop, None]))
+            down = _first(_windows(low, start, stop, n) <= base * (1 - lower[start:stop, None]))
+        touch = np.minimum(up, down)
+        chunk_label = np.where(touch == n, 0, np.where(down <= up, -1, 1)).astype("float64")
+        chunk_periods = np.minimum(touch + 1, n)
+
+        # Rows without a touch must have the full time limit of data after them:
+        rows = np.arange(start, stop)
+        complete = (touch < n) | (rows + n < size)
+        valid = complete & np.isfinite(close[start:stop]) & ~np.isnan(upper[start:stop]) & \
+            ~np.isnan(lower[start:stop])
+        end = np.minimum(rows + chunk_periods, size - 1)
+        label[start:stop] = np.where(valid, chunk_label, np.nan)
+        periods[start:stop] = np.where(valid, chunk_periods, np.nan)
+        change[start:stop] = np.where(valid, close[end] / close[start:stop] - 1, np.nan)
+    return label, periods, change
@@ -0,0 +1,151 @@
+"""Memory-mapped binary store for the minute data of a test dataset. The yearly
+CSV files of a dataset directory are converted once into a `store` sub-directory
+holding a contiguous int64 array of epoch timestamps (nanoseconds) and a float64
+array of the numeric columns (prices, volume etc.). Opening the store only maps
+the files into memory, so date ranges can be sliced from it without parsing or
+copying, and every `TestDataset` in a process shares the same mapping."""
+
+import datetime
+import numpy as np
+import os
+import pandas as pd
+
+from thales.config.cache import load_yaml, save_yaml
+from thales.config.schemas import get_dataset_schema, parse_datetime_column, read_schema_csv
+
+
+_OPEN_STORES = dict()  # Maps store directory to tuple of (mtime_ns, MinuteStore).
+
+
+def _year_csvs(data_dir: str) -> dict:
+    """Dict of year to filepath for each year CSV in a dataset directory."""
+    files = [f for f in os.listdir(data_dir) if f.endswith(".csv") and f[:-4].isdigit()]
+    return {int(f[:-4]): os.path.join(data_dir, f) for f in sorted(files)}
+
+
+def _year_columns(years: dict) -> list:
+    """Columns other than `datetime` in the headers of the year CSVs."""
+    columns = list()
+    for fp in years.values():
+        columns += [c for c in pd.read_csv(fp, nrows=0, encoding="utf-8").columns
+                    if c != "datetime" and c not in columns]
+    return columns
+
+
+def _numeric_columns(years: dict, schema: dict, sample: int = 1000) -> list:
+    """Columns other than `datetime` which are numeric in the first `sample`
+    rows of every year CSV they're in."""
+    numeric = dict()
+    for fp in years.values():
+        df = read_schema_csv(fp, schema, nrows=sample).drop(columns="datetime", errors="ignore")
+        for c in df.columns:
+            numeric[c] = numeric.get(c, True) and pd.api.types.is_numeric_dtype(df[c])
+    return [c for c, is_numeric in numeric.items() if is_numeric]
+
+
+class MinuteStore:
+    """Read-only memory-mapped minute data for a dataset directory."""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.directory = os.path.join(data_dir, "store")
+        meta = load_yaml(os.path.join(self.directory, "meta.yaml"))
+        self.columns = meta["columns"]
+        self.years = meta["years"]
+        self.timestamps = np.load(os.path.join(self.directory, "timestamps.npy"), mmap_mode="r")
+        self.values = np.load(os.path.join(self.directory, "values.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @staticmethod
+    def build(data_dir: str, columns: list = None) -> "MinuteStore":
+        """Convert all the year CSVs in a dataset directory into a store, with
+        every numeric column of the CSVs unless `columns` are passed."""
+        schema = get_dataset_schema(data_dir)
+        years = _year_csvs(data_dir)
+        assert years, f"No year CSV files to convert in directory: {data_dir}"
+        columns = _numeric_columns(years, schema) if columns is None else list(columns)
+        timestamps, values = list(), list()
+        for year, fp in years.items():
+            header = set(pd.read_csv(fp, nrows=0, encoding="utf-8").columns)
+            df = read_schema_csv(fp, schema, usecols=["datetime"] + [c for c in columns if c in header])
+            df = df.reindex(columns=["datetime"] + columns)  # Columns missing from a year are NaN.
+            df["datetime"] = parse_datetime_column(df["datetime"])
+            df = df.drop_duplicates(subset=["datetime"]).sort_values(by="datetime")
+            timestamps.append(df["datetime"].to_numpy(dtype="datetime64[ns]").view("i8"))
+            values.append(df[columns].to_numpy(dtype="float64"))
+        ts = np.concatenate(timestamps)
+        keep = np.r_[True, ts[1:] > ts[:-1]]  # Drop any overlap between years.
+
+        directory = os.path.join(data_dir, "store")
+        if not os.path.isdir(directory):
+            os.mkdir(directory)
+        meta_fp = os.path.join(directory, "meta.yaml")
+        if os.path.exists(meta_fp):
+            os.remove(meta_fp)
+
+        # Arrays are written to temporary files and then replace any old ones,
+        # so processes which still have the old store mapped aren't affected:
+        n = int(keep.sum())
+        ts_fp, values_fp = os.path.join(directory, "timestamps.npy"), os.path.join(directory, "values.npy")
+        ts_map = np.lib.format.open_memmap(f"{ts_fp}.tmp", mode="w+", dtype="int64", shape=(n,))
+        ts_map[:] = ts[keep]
+        values_map = np.lib.format.open_memmap(f"{values_fp}.tmp", mode="w+", dtype="float64",
+                                               shape=(n, len(columns)))
+        values_map[:] = np.concatenate(values)[keep]
+        ts_map.flush()
+        values_map.flush()
+        del ts_map, values_map
+        os.replace(f"{ts_fp}.tmp", ts_fp)
+        os.replace(f"{values_fp}.tmp", values_fp)
+
+        # The meta file is written last, so a store only opens once it's complete:
+        save_yaml({"columns": columns, "years": sorted(years)}, meta_fp)
+        return open_store(data_dir)
+
+    def is_stale(self) -> bool:
+        """True if the year CSVs have been added to or modified since the store
+        was built."""
+        years = _year_csvs(self.data_dir)
+        if sorted(years) != self.years:
+            return True
+        built = os.path.getmtime(os.path.join(self.directory, "meta.yaml"))
+        return any(os.path.getmtime(fp) > built for fp in years.values())
+
+    def missing_columns(self) -> list:
+        """Columns of the year CSVs which aren't held in the store (e.g. text
+        columns, or columns left out when it was built)."""
+        return [c for c in _year_columns(_year_csvs(self.data_dir)) if c not in self.columns]
+
+    def locate(self, start: datetime.datetime = None,
+               end: datetime.datetime = None) -> tuple:
+        """Integer positions `(i, j)` such that rows `i:j` are all those with
+        timestamps between `start` and `end` inclusive."""
+        i = 0 if start is None else int(np.searchsorted(self.timestamps, pd.Timestamp(start).value, side="left"))
+        j = len(self) if end is None else int(np.searchsorted(self.timestamps, pd.Timestamp(end).value, side="right"))
+        return i, max(i, j)
+
+    def frame(self, start: datetime.datetime = None,
+              end: datetime.datetime = None) -> pd.DataFrame:
+        """DataFrame of the rows between `start` and `end` inclusive, with a
+        `datetime` index. The price data is a view of the memory-mapped array
+        rather than a copy."""
+        i, j = self.locate(start, end)
+        index = pd.DatetimeIndex(self.timestamps[i:j].view("datetime64[ns]"), name="datetime")
+        return pd.DataFrame(self.values[i:j], index=index, columns=self.columns, copy=False)
+
+
+def open_store(data_dir: str):
+    """Open the store for a dataset directory, or return None if it hasn't been
+    built. Stores are cached so each one is only mapped once per process."""
+    directory = os.path.join(data_dir, "store")
+    meta_fp = os.path.join(directory, "meta.yaml")
+    if not os.path.exists(meta_fp):
+        return None
+    mtime = os.stat(meta_fp).st_mtime_ns
+    cached = _OPEN_STORES.get(directory)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, MinuteStore(data_dir))
+        _OPEN_STORES[directory] = cached
+    return cached[1]
@@ -1,16 +1,31 @@
 
-from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count, product
+from joblib import delayed, Parallel
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+import shutil
+import tempfile
+import time
+import tracemalloc
+import warnings
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from sklearn.model_selection import GridSearchCV, ParameterGrid
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
 from thales.config.exceptions import InvalidIndicator
+from thales.config.paths import io_path
 from thales.config.sources import validate_source
 from thales.config.utils import DEFAULT_SUBDIR
 from thales.data import CSVLoader
+from thales.data.feature_store import FeatureStore, spec_key
+from thales.data.features import attach_array, BuildReport, FeatureMatrix, share_array
+from thales.data.labels import first_touch, forward_labels, label_name
+from thales.data.spill import ColumnSpill
+from thales.data.splits import holdout, walk_forward_folds, walk_forward_steps
 from thales.indicators import ALL_INDICATORS
 from thales.indicators.base import DataFrameInDataFrameOut, DataFrameInSeriesOut, SeriesInSeriesOut, \
     SeriesInDataFrameOut
@@ -21,12 +36,15 @@ class MLDataset:
     """
 
     def __init__(self, src: str = None, subdir: str = None,
-                 precision: float = 5):
-        """Set parameters for loading data into the dataset."""
+                 precision: float = 5, memory_budget: float = None):
+        """Set parameters for loading data into the dataset. If a memory budget
+        (in MB) is passed, the least recently used feature and label columns
+        are spilled to disk whenever `df` and `futures` exceed it."""
         # Data loading parameters:
         self.src = validate_source(src)
         self.subdir = DEFAULT_SUBDIR if subdir is None else subdir
         self.precision = precision
+        self.memory_budget = memory_budget
 
         # Attrs to store loaded data:
         self._loaded = dict()  # Tracks data has already been loaded for which symbols.
@@ -36,55 +54,217 @@ class MLDataset:
         self.futures = pd.DataFrame()
         self.X = pd.DataFrame()
         self.y = pd.Series()
-        self.train_X = pd.DataFrame()
-        self.train_y = pd.Series()
-        self.test_X = pd.DataFrame()
-        self.test_y = pd.Series()
-        self.val_ix = list()  # List of indices of validation sets.
+        self.train_ix = slice(0, 0)  # Row positions of the training set in `X` and `y`.
+        self.test_ix = slice(0, 0)  # Row positions of the test set in `X` and `y`.
+        self.fold_params = dict()  # Parameters of the walk-forward validation folds.
         self.ml_data = dict()
         self.models = dict()
+        self.feature_report = dict()
+        self.specs = dict()  # Maps feature/label column to tuple of (symbol, spec key).
+        self._done_specs = set()  # Spec keys of features/labels already in `df`/`futures`.
+        self._spills = dict()  # Maps `df`/`futures` to a ColumnSpill of their spilled columns.
+        self._last_used = dict()  # Maps column to the count of column uses when it was last used.
+        self._uses = count()
 
     def _update_future_index(self):
         """Reset the index of the `ys` attr to match that of the `df` attr."""
         self.futures = self.futures.reindex(self.df.index)
 
+    def _register(self, sym: str, key: str, *columns: str):
+        """Record the spec a feature or label's columns were computed from."""
+        for c in columns:
+            self.specs[c] = (sym.upper(), key)
+        self._done_specs.add(key)
+
+    def _column_names(self, frame: str) -> list:
+        """Names of the columns of `df` or `futures`, including spilled ones."""
+        spill = self._spills.get(frame)
+        return list(getattr(self, frame).columns) + (list(spill.columns) if spill else list())
+
+    def _price_columns(self) -> set:
+        return {self._make_column_name(sym, c) for sym, cols in self._loaded.items() for c in cols}
+
+    def _touch(self, *columns: str):
+        for c in columns:
+            self._last_used[c] = next(self._uses)
+
+    def _frame_bytes(self) -> int:
+        return int(self.df.memory_usage(deep=False).sum() + self.futures.memory_usage(deep=False).sum())
+
+    def _protected_bytes(self, keep: tuple = ()) -> int:
+        """Bytes of the loaded price columns (and columns in `keep`), which
+        are never spilled."""
+        protected = self._price_columns() | set(keep)
+        return int(sum(getattr(self, frame)[c].memory_usage(index=False, deep=False) for frame in ("df", "futures")
+                       for c in getattr(self, frame).columns if c in protected))
+
+    def _warn_over_budget(self):
+        warnings.warn(f"Loaded price columns alone exceed the memory budget of {self.memory_budget:,} MB, "
+                      f"so the budget can't be met by spilling features and labels.")
+
+    def _feature_matrix(self, capacity: int) -> FeatureMatrix:
+        """Feature matrix for building columns of `df`, with its capacity
+        limited to a chunk of the memory budget (see `_over_budget`)."""
+        if self.memory_budget is not None and len(self.df.index):
+            chunk = self.memory_budget * 2 ** 20 / 8
+            capacity = min(capacity, int(chunk // (8 * len(self.df.index))) + 1)
+        return FeatureMatrix(self.df.index, capacity=capacity)
+
+    def _over_budget(self, features: FeatureMatrix) -> bool:
+        """True if the features built so far should be joined onto `df` (and
+        the least recently used columns spilled), because they and `df` and
+        `futures` exceed the memory budget. Features are joined in chunks of at
+        least an eighth of the budget, so the columns aren't fragmented by
+        joining them one at a time."""
+        if self.memory_budget is None or not len(features):
+            return False
+        budget = self.memory_budget * 2 ** 20
+        return features.nbytes >= budget / 8 and self._frame_bytes() + features.nbytes > budget
+
+    def _enforce_budget(self, keep: tuple = ()):
+        """Spill the least recently used feature and label columns (never the
+        loaded price columns or those in `keep`) until `df` and `futures` fit
+        within the memory budget."""
+        if self.memory_budget is None:
+            return
+        budget, used = self.memory_budget * 2 ** 20, self._frame_bytes()
+        if used <= budget:
+            return
+        protected = self._price_columns() | set(keep)
+        candidates = sorted((self._last_used.get(c, -1), i, frame, c) for frame in ("df", "futures")
+                            for i, c in enumerate(getattr(self, frame).columns) if c not in protected)
+        to_spill = {"df": list(), "futures": list()}
+        for _, _, frame, c in candidates:
+            if used <= budget:
+                break
+            to_spill[frame].append(c)
+            used -= getattr(self, frame)[c].memory_usage(index=False, deep=False)
+        for frame, columns in to_spill.items():
+            if columns:
+                if frame not in self._spills:
+                    self._spills[frame] = ColumnSpill(prefix=f"mldataset_{frame}_")
+                self._spills[frame].spill(getattr(self, frame)[columns])
+                setattr(self, frame, getattr(self, frame).drop(columns=columns))
+        if used > budget and self._protected_bytes() > budget:
+            self._warn_over_budget()
+
+    def _page_in(self, frame: str, *columns: str):
+        """Read spilled columns of `df` or `futures` back into memory, and mark
+        the columns as used."""
+        spill = self._spills.get(frame)
+        spilled = [c for c in columns if spill and c in spill]
+        if spilled:
+            current = getattr(self, frame)
+            setattr(self, frame, pd.concat([current, spill.pop(*spilled, index=current.index)], axis=1))
+        self._touch(*columns)
+        self._enforce_budget(keep=columns)
+
+    def _column_values(self, frame: str, column: str) -> np.ndarray:
+        """Values of a column of `df` or `futures`, memory-mapped if it has been
+        spilled, without paging it back in."""
+        current = getattr(self, frame)
+        if column in current.columns:
+            return current[column].to_numpy()
+        return self._spills[frame].get(column, current.index)
+
+    def memory_usage(self) -> pd.Series:
+        """Bytes of memory used by `df`, `futures`, `X` and `y` and in total,
+        the bytes of spilled columns on disk, and the memory budget."""
+        usage = pd.Series({"df": self.df.memory_usage(deep=True).sum(),
+                           "futures": self.futures.memory_usage(deep=True).sum(),
+                           "X": self.X.memory_usage(deep=True).sum(), "y": self.y.memory_usage(deep=True)})
+        usage["total"] = usage.sum()
+        usage["spilled"] = sum(spill.nbytes for spill in self._spills.values())
+        usage["budget"] = np.nan if self.memory_budget is None else self.memory_budget * 2 ** 20
+        if self.memory_budget is not None and self._protected_bytes() > usage["budget"]:
+            self._warn_over_budget()
+        return usage
+
+    def create_labels(self, sym: str, ohlct: str = "c", horizons: list = (1,),
+                      funcs: tuple = ("pc", "min", "max", "mean", "vol")) -> list:
+        """Create future columns for a list of horizons (numbers of time periods,
+        i.e. rows) and label functions at once (see `forward_labels`), and
+        return their names. Columns which already exist aren't recalculated."""
+        self.load(sym, ohlct)
+        col_name = self._make_column_name(sym, ohlct)
+        names = [label_name(col_name, f, n) for n in horizons for f in funcs]
+        self._update_future_index()
+        existing = set(self._column_names("futures"))
+        todo = {(f, n) for n in horizons for f in funcs if label_name(col_name, f, n) not in existing}
+        if todo:
+            new = forward_labels(self.df[col_name], sorted({n for _, n in todo}), sorted({f for f, _ in todo}))
+            new = new[[c for c in new.columns if c not in existing]]
+            self.futures = pd.concat([self.futures, new], axis=1)
+            for f, n in todo:
+                self._register(sym, spec_key(f"label_{f}", sym=sym.upper(), ohlct=ohlct, n=n),
+                               label_name(col_name, f, n))
+            self._touch(*new.columns)
+            self._enforce_budget()
+        return names
+
+    def create_barrier_labels(self, sym: str, upper: object, lower: object,
+                              n: int, ohlct: str = "c", high_low: bool = True,
+                              name: str = None) -> list:
+        """Create triple-barrier future columns (see `first_touch`) giving, for
+        every date, whether the price rises by `upper` or falls by `lower`
+        (fractions of the price) first, or neither within `n` time periods. The
+        widths can be floats or Series with a width for each date in `df`, e.g.
+        a multiple of recent volatility. Returns the names of the label, periods
+        and percent change columns, which can be passed to `choose_y`.
+
+        Args:
+            sym: symbol to label.
+            upper: profit-take barrier width, or None for no barrier.
+            lower: stop-loss barrier width, or None for no barrier.
+            n: time limit in number of time periods (i.e. rows).
+            ohlct: price column the barriers are relative to.
+            high_low: detect touches with the high/low prices of each period.
+            name: name for the barriers in the column names; defaults to the
+                widths if they are floats, and is required otherwise.
+        """
+        if name is None:
+            assert not any(isinstance(w, (pd.Series, np.ndarray)) for w in (upper, lower)), \
+                "Must pass a `name` for barriers with widths for each date."
+            name = f"u={upper}_l={lower}"
+        self.load(sym, ohlct, *(("h", "l") if high_low else ()))
+        col_name = self._make_column_name(sym, ohlct)
+        names = [f"{col_name}_barrier_{name}_n={n}_{c}" for c in ("label", "periods", "pc")]
+        self._update_future_index()
+        if all(c in self._column_names("futures") for c in names):
+            return names
+        self._page_in("futures", *names)
+
+        def align(width):
+            return width.reindex(self.df.index).to_numpy(dtype="float64") if isinstance(width, pd.Series) else width
+
+        high = self.df[self._make_column_name(sym, "h")].to_numpy() if high_low else None
+        low = self.df[self._make_column_name(sym, "l")].to_numpy() if high_low else None
+        label, periods, change = first_touch(self.df[col_name].to_numpy(), align(upper), align(lower), n,
+                                             high=high, low=low)
+        new = pd.DataFrame(dict(zip(names, (label, periods, change))), index=self.df.index)
+        self.futures = pd.concat([self.futures.drop(columns=names, errors="ignore"), new], axis=1)
+        self._register(sym, spec_key("barrier", sym=sym.upper(), ohlct=ohlct, name=name, n=n, high_low=high_low),
+                       *names)
+        self._touch(*names)
+        self._enforce_budget()
+        return names
+
     def _future_shift(self, sym: str, ohlct: str = "c", n: int = 1):
         """Create a future column which is simply an OHLCT price shifted `n`
         time periods (i.e. rows) into the future."""
-        self.load(sym, ohlct)
-        df_col_name = self._make_column_name(sym, ohlct)
-        new_col_name = f"{df_col_name}_n+{n}"
-        if new_col_name not in self.futures.columns:
-            src_series = self.df[df_col_name]
-            self._update_future_index()
-            self.futures[new_col_name] = src_series.shift(-n)
-        return new_col_name
+        return self.create_labels(sym=sym, ohlct=ohlct, horizons=[n], funcs=("shift",))[0]
 
     def create_future_pc(self, sym: str, ohlct: str = "c", n: int = 1):
         """Create a future column which is the percentage difference between the
         current date's OHLCT price and the same OHLCT price shifted `n` time
         periods (i.e. rows) into the future."""
-        df_col_name = self._make_column_name(sym, ohlct)
-        new_col_name = f"{df_col_name}_n+{n}_pc"
-        if new_col_name not in self.futures.columns:
-            future_col = self._future_shift(sym=sym, ohlct=ohlct, n=n)
-            self.futures[new_col_name] = (self.futures[future_col] - self.df[df_col_name]) / self.df[df_col_name]
-        return new_col_name
+        return self.create_labels(sym=sym, ohlct=ohlct, horizons=[n], funcs=("shift", "pc"))[1]
 
     def _rolling_future(self, sym: str, ohlct: str = "l", n: int = 5,
                         func: str = "min"):
         """Create a column summarizing the price data for the next `n` days
         after a date, e.g. giving mean/min/max of ohlc."""
-        self.load(sym, ohlct)
-        col_name = self._make_column_name(sym, ohlct)
-        new_col_name = f"{col_name}_future_{func}_n={n}"
-        if new_col_name in self.futures.columns:
-            return new_col_name
-        s = self.df[col_name]
-        rf = eval(f"s.rolling(n).{func}()")
-        self.futures[new_col_name] = rf.shift(-n)
-        self._update_future_index()
-        return new_col_name
+        return self.create_labels(sym=sym, ohlct=ohlct, horizons=[n], funcs=(func,))[0]
 
     def create_future_min(self, sym: str, ohlct: str = "l", n: int = 1):
         """Create a future column giving the minimum of a price column over the
@@ -113,108 +293,363 @@ class MLDataset:
             sym: which symbol to load data for.
             ohlct: which columns to load from o/h/l/c.
         """
+        self.load_many([sym], *ohlct)
+
+    def load_many(self, symbols: list, *ohlct, n_jobs: int = None):
+        """Add data for multiple symbols into the `df` attribute. All the
+        symbols' files are read in one call, aligned on the union of their
+        datetimes and the datetimes already in `df`, and written into a single
+        preallocated block of new columns.
+
+        Args:
+            symbols: which symbols to load data for.
+            ohlct: which columns to load from o/h/l/c.
+            n_jobs: number of threads to read the symbols' files with.
+        """
         assert ohlct, "Must pass at least 1 ohlct arg."
-        sym = sym.upper()
-        cols_to_load = [s[0].lower() for s in ohlct]
-        already_loaded = self._loaded.get(sym, list())
-        cols_to_load = sorted(set(cols_to_load) - set(already_loaded))
-        if not cols_to_load:  # Nothing new to load:
+        cols = sorted({s[0].lower() for s in ohlct})
+        to_load = dict()  # Maps symbol to the columns not already loaded.
+        for sym in {str.upper(s) for s in symbols}:
+            new_cols = [c for c in cols if c not in self._loaded.get(sym, list())]
+            if new_cols:
+                to_load[sym] = new_cols
+        if not to_load:  # Nothing new to load:
             return
-        df = CSVLoader.load_by_symbol(sym, src=self.src, subdir=self.subdir, precision=self.precision)
-        df = df.set_index("datetime").sort_index()
-        df = df[self.full_column_name(*ohlct)]
-        df = df.rename(columns={c: f"{sym}_{c}" for c in df.columns})
-        self.df = pd.merge(self.df, df, left_index=True, right_index=True, how="outer")
-        self._loaded[sym.upper()] = sorted(set(already_loaded + cols_to_load))
+        df = CSVLoader.load_by_symbol(*to_load, src=self.src, subdir=self.subdir, precision=self.precision,
+                                      n_jobs=n_jobs)
+        assert df is not None, f"No data found for symbols: {sorted(to_load)}"
+
+        # Row of every loaded price in the union of all datetimes:
+        dt = df["datetime"].to_numpy(dtype="datetime64[ns]").view("i8")
+        index = np.unique(dt)
+        if len(self.df.columns):
+            index = np.union1d(index, self.df.index.to_numpy(dtype="datetime64[ns]").view("i8"))
+        rows = np.searchsorted(index, dt)
+
+        names, columns = list(), list()
+        for sym in sorted(to_load):
+            for c in self.full_column_name(*to_load[sym]):
+                names.append((sym, c))
+                columns.append(f"{sym}_{c}")
+        block = np.full((len(index), len(columns)), np.nan)
+        positions = df.groupby(df["symbol"].astype(str)).indices
+        for j, (sym, c) in enumerate(names):
+            ix = positions.get(sym)
+            if ix is not None:
+                block[rows[ix], j] = df[c].to_numpy(dtype="float64")[ix]
+
+        new = pd.DataFrame(block, index=pd.DatetimeIndex(index.view("datetime64[ns]"), name="datetime"),
+                           columns=columns)
+        if len(self.df.columns):
+            old = self.df if self.df.index.equals(new.index) else self.df.reindex(new.index)
+            new = pd.concat([old, new], axis=1)
+        self.df = new
+        for sym, new_cols in to_load.items():
+            self._loaded[sym] = sorted(set(self._loaded.get(sym, list()) + new_cols))
+        self._enforce_budget()
 
-    def apply_indicator(self, indicator: str, sym: str, ohlct: str = "c",
-                        **params):
+    @staticmethod
+    def _indicator_class(indicator: str):
         try:
-            cls = ALL_INDICATORS[indicator.lower().strip()]
+            return ALL_INDICATORS[indicator.lower().strip()]
         except KeyError:
-            raise (InvalidIndicator(indicator))
+            raise InvalidIndicator(indicator)
+
+    def _calculate_indicator(self, indicator: str, sym: str, ohlct: str = "c",
+                             **params):
+        """Calculate a technical indicator from the price data in `df`."""
+        cls = self._indicator_class(indicator)
         if issubclass(cls, SeriesInSeriesOut) or issubclass(cls, SeriesInDataFrameOut):
             col_name = self._make_column_name(sym, ohlct)
             s = self.df[col_name]
-            ti = cls(s, **params)
+            return cls(s, **params)
         elif issubclass(cls, DataFrameInSeriesOut) or issubclass(cls, DataFrameInDataFrameOut):
-            ti = cls(df=self.df, sym=sym, pc_ratio_col=ohlct, **params)
+            return cls(df=self.df, sym=sym, pc_ratio_col=ohlct, **params)
         else:
             raise NotImplementedError(f"`apply_indicator` not implemented for: {cls}")
 
+    def _add_indicator(self, features: FeatureMatrix, indicator: str, sym: str,
+                       ohlct: str = "c", **params):
+        """Calculate a technical indicator and add its output columns which
+        aren't already in `df` to a feature matrix. Indicators with the same
+        spec as one already calculated (or loaded from the feature store) are
+        skipped."""
+        key = spec_key(indicator.lower().strip(), sym=sym.upper(), ohlct=ohlct, **params)
+        if key in self._done_specs:
+            return
+        ti = self._calculate_indicator(indicator, sym, ohlct, **params)
+        spill = self._spills.get("df", dict())
         if isinstance(ti, pd.Series):
-            if ti.name not in self.df.columns:
-                self.df[ti.name] = ti
+            if ti.name not in self.df.columns and ti.name not in spill:
+                features.add(ti.name, ti)
+                self._register(sym, key, ti.name)
         elif isinstance(ti, pd.DataFrame):
-            new_cols = set(ti.columns) - set(self.df.columns)
+            new_cols = [c for c in ti.columns if c not in self.df.columns and c not in spill]
             if new_cols:
-                self.df = pd.merge(self.df, ti[new_cols], left_index=True, right_index=True, how="outer")
+                features.add_frame(ti[new_cols])
+                self._register(sym, key, *new_cols)
+
+    def _join_features(self, features: FeatureMatrix):
+        """Add the columns of a feature matrix to `df` in one step, emptying
+        the matrix."""
+        if len(features):
+            self.df = pd.concat([self.df, features.flush()], axis=1, copy=False)
+            self._enforce_budget()
+
+    def apply_indicator(self, indicator: str, sym: str, ohlct: str = "c",
+                        **params):
+        features = self._feature_matrix(2)
+        self._add_indicator(features, indicator, sym=sym, ohlct=ohlct, **params)
+        self._join_features(features)
 
     @staticmethod
     def _permutations(**params) -> pd.DataFrame:
         return pd.DataFrame(list(product(*params.values())), columns=params.keys())
 
-    def iterate_indicator_params(self, indicator: str, sym: str,
-                                 ohlct: str = "c", **params):
-        """Apply a technical indicator multiple times with different parameters,
-        by passing key-value pairs of parameter name and lists of values. If no
-        parameters are passed, all combinations in the indicator's `parameters`
-        attribute will be iterated."""
-        try:
-            cls = ALL_INDICATORS[indicator.lower().strip()]
-        except KeyError:
-            raise InvalidIndicator(indicator)
+    def _iterate_indicator_params(self, features: FeatureMatrix, indicator: str,
+                                  sym: str, ohlct: str = "c", **params):
         if not params:
-            params = cls.parameters
+            params = self._indicator_class(indicator).parameters
         param_perms = self._permutations(**params)
         for _, row in param_perms.iterrows():
             try:
-                self.apply_indicator(indicator, sym=sym, ohlct=ohlct, **row)
+                self._add_indicator(features, indicator, sym=sym, ohlct=ohlct, **row)
             except AssertionError:
                 continue
+            if self._over_budget(features):
+                self._join_features(features)
 
-    def apply_all(self, sym: str, ohlct: str = "c"):
+    def iterate_indicator_params(self, indicator: str, sym: str,
+                                 ohlct: str = "c", **params):
+        """Apply a technical indicator multiple times with different parameters,
+        by passing key-value pairs of parameter name and lists of values. If no
+        parameters are passed, all combinations in the indicator's `parameters`
+        attribute will be iterated. The outputs are collected in a preallocated
+        feature matrix and added to `df` once, or in chunks if they would
+        exceed the memory budget."""
+        n = len(self._permutations(**(params or self._indicator_class(indicator).parameters)))
+        features = self._feature_matrix(n)
+        self._iterate_indicator_params(features, indicator, sym, ohlct, **params)
+        self._join_features(features)
+
+    def apply_all(self, sym: str, ohlct: str = "c", verbose: bool = False,
+                  store: bool = False):
         """Apply all parameter permutations for all technical indicators for the
-        given symbol."""
-        for indicator in ALL_INDICATORS.keys():
-            self.iterate_indicator_params(indicator, sym, ohlct)
+        given symbol. The outputs are collected in a preallocated feature matrix
+        and added to `df` once (or in chunks if they would exceed the memory
+        budget, spilling the least recently used columns); the wall time, peak
+        memory traced while building the features and the number of columns
+        added are stored in the `feature_report` attribute. If `store` is True
+        features are loaded from the feature store if the symbol's data hasn't
+        changed since they were saved, and only the rest are calculated and
+        then published."""
+        if store:
+            self.load_stored(sym)
+        capacity = sum(len(self._permutations(**cls.parameters)) for cls in ALL_INDICATORS.values())
+        before = len(self._column_names("df"))
+        with BuildReport() as report:
+            features = self._feature_matrix(capacity)
+            for indicator in ALL_INDICATORS.keys():
+                self._iterate_indicator_params(features, indicator, sym, ohlct)
+            self._join_features(features)
+        added = len(self._column_names("df")) - before
+        self.feature_report = dict(columns=added, **report.to_dict())
+        if verbose:
+            print(f"Added {added:,} features for {sym.upper()} in {report.seconds:.2f}s "
+                  f"(peak memory {report.peak_mb:,.1f} MB)")
+        if store:
+            self.publish(sym)
+
+    def apply_all_many(self, symbols: list, ohlct: str = "c", workers: int = None,
+                       verbose: bool = False, store: bool = False):
+        """Apply all parameter permutations for all technical indicators for
+        multiple symbols, calculating each symbol's features in a separate
+        process. Price data is passed to the processes, and their features
+        passed back, through shared memory rather than being pickled. Each
+        symbol's features are added to `df` as soon as they're merged, in the
+        order of `symbols`, so only one symbol's features are held outside `df`
+        at a time. The `feature_report` attribute records the total wall time
+        and the peak memory traced in this process.
+
+        Args:
+            symbols: which symbols to calculate features for.
+            ohlct: price column to calculate single-input indicators from.
+            workers: number of processes, defaults to the number of CPUs.
+            verbose: print the time taken and number of features added.
+            store: load/publish features from/to the feature store (see
+                `apply_all`).
+        """
+        symbols = list(dict.fromkeys(str.upper(s) for s in symbols))
+        self.load_many(symbols, "o", "h", "l", "c")
+        if store:
+            for sym in symbols:
+                self.load_stored(sym)
+        price_cols = [self._make_column_name(sym, c) for sym in symbols for c in "ohlc"]
+
+        added = 0
+        with BuildReport() as report:
+            prices_block, prices = share_array(np.ascontiguousarray(self.df[price_cols].to_numpy(dtype="float64").T))
+            index_block, index = share_array(self.df.index.to_numpy(dtype="datetime64[ns]").view("i8"))
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = dict()
+                    for i, sym in enumerate(symbols):
+                        futures[sym] = pool.submit(_symbol_features, sym, ohlct, self.src, self.subdir,
+                                                   self.precision, self._done_specs, prices, index, 4 * i,
+                                                   price_cols[4 * i:4 * i + 4])
+                    # Results are merged in order of symbol, whatever order they finish in:
+                    for sym in symbols:
+                        out, columns, specs, rows = futures[sym].result()
+                        if not columns:
+                            continue
+                        block, values = attach_array(out)
+                        try:
+                            existing = set(self._column_names("df"))
+                            new = [j for j, c in enumerate(columns) if c not in existing]
+                            features = FeatureMatrix(self.df.index, capacity=len(new))
+                            for j in new:
+                                features.add_rows(columns[j], values[j], rows)
+                                self._register(sym, specs[columns[j]], columns[j])
+                        finally:
+                            del values
+                            block.close()
+                            block.unlink()
+                        added += len(features)
+                        self._join_features(features)
+            finally:
+                prices_block.close()
+                prices_block.unlink()
+                index_block.close()
+                index_block.unlink()
+        self.feature_report = dict(columns=added, **report.to_dict())
+        if verbose:
+            print(f"Added {added:,} features for {len(symbols):,} symbols in {report.seconds:.2f}s "
+                  f"(peak memory {report.peak_mb:,.1f} MB)")
+        if store:
+            self.publish(*symbols)
+
+    def _store(self, sym: str) -> FeatureStore:
+        return FeatureStore(sym, src=self.src, subdir=self.subdir, precision=self.precision)
+
+    def publish(self, *sym: str):
+        """Save the feature columns in `df` and the label columns in `futures`
+        calculated for symbols (by default all loaded symbols) to the feature
+        store, so later datasets can load them instead of recalculating."""
+        for s in ({str.upper(s) for s in sym} if sym else self._loaded):
+            specs = {c: key for c, (spec_sym, key) in self.specs.items() if spec_sym == s}
+            store = self._store(s)
+            for frame, kind in (("df", "feature"), ("futures", "label")):
+                columns = {c: self._column_values(frame, c) for c in self._column_names(frame) if c in specs}
+                store.save_arrays(getattr(self, frame).index, columns, specs, kind=kind)
+
+    def load_stored(self, sym: str, *columns: str) -> list:
+        """Load feature and label columns of a symbol from the feature store
+        (by default all of them) which were calculated from the current version
+        of the symbol's data, and return their names. Features are added to
+        `df` and labels to `futures`, and neither are recalculated later."""
+        store = self._store(sym)
+        entries = store.fresh(*columns)
+        existing = set(self._column_names("df") + self._column_names("futures"))
+        entries = {c: e for c, e in entries.items() if c not in existing}
+        if not entries:
+            return list()
+        frames = store.load(*entries, index=self.df.index if len(self.df.columns) else None)
+        if "feature" in frames:
+            self.df = pd.concat([self.df, frames["feature"]], axis=1) if len(self.df.columns) else frames["feature"]
+        if "label" in frames and not len(self.df.columns):
+            self.futures = pd.concat([self.futures, frames["label"]], axis=1)
+        elif "label" in frames:
+            self._update_future_index()
+            self.futures = pd.concat([self.futures, frames["label"].reindex(self.df.index)], axis=1)
+
+        # A spec is only done if all of its stored columns were loaded:
+        loaded = {e["spec"] for e in entries.values()}
+        for c, e in store.fresh().items():
+            if e["spec"] in loaded and c not in entries and c not in existing:
+                loaded.discard(e["spec"])
+        for c, e in entries.items():
+            self.specs[c] = (sym.upper(), e["spec"])
+        self._done_specs.update(loaded)
+        self._enforce_budget()
+        return list(entries)
 
     def choose_y(self, y_col: str):
         """Choose a column from the `futures` attribute to be the target for
         learning, and set the indices of the `X` and `y` attributes to only
-        include notna rows in both."""
+        include notna rows in both. Spilled feature columns are read into `X`
+        from their memory-mapped files, without paging them back into `df`."""
+        self._page_in("futures", y_col)
         y: pd.Series = self.futures[y_col].dropna()
-        self.X = self.df.loc[y.index].dropna()
+        columns = self._column_names("df")
+        self._touch(*columns)
+        if "df" not in self._spills or not len(self._spills["df"]):
+            self.X = self.df.loc[y.index].dropna()
+        else:
+            rows = self.df.index.get_indexer(y.index)
+            features = FeatureMatrix(y.index, capacity=len(columns))
+            for c in columns:
+                features.add(c, self._column_values("df", c)[rows])
+            self.X = features.to_frame().dropna()
         self.y = y.loc[self.X.index]
 
-    def split_xy(self, test_size: float = 0.3, n_splits: int = 5):
-        """Create the training/test datasets.
+    def split_xy(self, test_size: float = 0.3, n_splits: int = 5,
+                 purge: int = 0, embargo: int = 0, max_train_size: int = None):
+        """Create the training/test datasets. The sets are row positions in `X`
+        and `y` rather than copies, and `train_X`, `test_y` etc. are views of
+        them. Validation folds of the training set are generated by `folds`.
 
+        Args:
+            test_size: fraction of the last rows to use as the test set.
+            n_splits: number of walk-forward validation folds.
+            purge: number of rows before each validation/test set whose labels
+                overlap it (e.g. the horizon of the label), which are left out
+                of the training set before it.
+            embargo: number of extra rows to leave out between the training set
+                and each validation/test set.
+            max_train_size: max number of rows in each validation fold's
+                training set.
         """
         assert (self.X.index == self.y.index).all()
-        assert 0 < test_size < 1, f"Invalid test_size, should be float between 0 and 1: {test_size}"
-        n = len(self.X.index)
-        test_n = int(test_size * n)
+        self.train_ix, self.test_ix = holdout(len(self.X.index), test_size, gap=purge + embargo)
+        self.fold_params = dict(n_splits=n_splits, purge=purge, embargo=embargo, max_train_size=max_train_size)
+
+        # Final check that the last fold validates on the last training rows:
+        *_, (_, last_val) = self.folds()
+        assert last_val[-1] == self.train_ix.stop - 1
+
+    def folds(self):
+        """Generate the (train, validation) row positions in `train_X` and
+        `train_y` of each walk-forward validation fold (see `split_xy`)."""
+        return walk_forward_folds(self.train_ix.stop, **self.fold_params)
+
+    @property
+    def val_ix(self) -> list:
+        """List of the (train, validation) row positions of every fold."""
+        return list(self.folds())
+
+    @property
+    def train_X(self) -> pd.DataFrame:
+        return self.X.iloc[self.train_ix]
 
-        # Create the test_set attributes:
-        self.test_X = self.X.iloc[-test_n:].copy()
-        self.test_y = self.y.iloc[-test_n:].copy()
+    @property
+    def train_y(self) -> pd.Series:
+        return self.y.iloc[self.train_ix]
 
-        # Create the training/validation test sets:
-        self.train_X = self.X.iloc[:-test_n].copy()
-        self.train_y = self.y.iloc[:-test_n].copy()
-        ts = TimeSeriesSplit(n_splits=n_splits)
-        self.val_ix = list(ts.split(self.train_X))
+    @property
+    def test_X(self) -> pd.DataFrame:
+        return self.X.iloc[self.test_ix]
 
-        # Final check to make sure all data in sets:
-        assert len(self.test_X) + len(self.val_ix[-1][0]) + len(self.val_ix[-1][1]) == len(self.X)
+    @property
+    def test_y(self) -> pd.Series:
+        return self.y.iloc[self.test_ix]
 
     def plot_indicator(self, indicator: str, sym: str, ohlct: str = "c",
                        n_recent: int = 200, plot_price: bool = True):
         """Quickly plot columns from `df` for a specific indicator."""
         col = self._make_column_name(sym, ohlct)
         indicator = indicator.upper().strip()
-        columns = [c for c in self.df.columns if (indicator in c) and (col in c)]
+        columns = [c for c in self._column_names("df") if (indicator in c) and (col in c)]
+        self._page_in("df", *columns)
         fig, ax = plt.subplots(figsize=(12, 10))
         for c in columns:
             ax.plot(self.df[c].iloc[-n_recent:], label=c)
@@ -228,14 +663,80 @@ class MLDataset:
         """Plot a histogram of the percent change between a symbol's price on a
         date vs. the price `n` days into the future."""
         col_name = self.create_future_pc(sym=sym, ohlct=ohlct, n=n)
+        self._page_in("futures", col_name)
         fig, ax = plt.subplots(figsize=figsize)
         ax.hist(self.futures[col_name], bins=bins)
         return fig
 
 
+def _symbol_features(sym: str, ohlct: str, src: str, subdir: str, precision: float,
+                     done: set, prices: tuple, index: tuple, first_col: int,
+                     price_cols: list) -> tuple:
+    """Calculate all the features of one symbol in a worker process of
+    `MLDataset.apply_all_many`, from the rows of the shared price data which
+    have prices for the symbol. Returns the shared memory spec of the features
+    (an array with a row per column), the column names, their spec keys and
+    the positions of the symbol's rows in the full index."""
+    if tracemalloc.is_tracing():  # Inherited from the parent process if it was forked.
+        tracemalloc.stop()
+    prices_block, all_prices = attach_array(prices)
+    index_block, all_index = attach_array(index)
+    sym_prices = all_prices[first_col:first_col + len(price_cols)]
+    rows = np.flatnonzero(~np.isnan(sym_prices).any(axis=0))
+    dt = pd.DatetimeIndex(all_index[rows].view("datetime64[ns]"), name="datetime")
+    df = pd.DataFrame(sym_prices[:, rows].T, index=dt, columns=price_cols)
+    del all_prices, all_index, sym_prices  # Views must be released before closing.
+    prices_block.close()
+    index_block.close()
+
+    data = MLDataset(src=src, subdir=subdir, precision=precision)
+    data.df = df
+    data._loaded[sym] = ["c", "h", "l", "o"]
+    data._done_specs = set(done)
+    capacity = sum(len(data._permutations(**cls.parameters)) for cls in ALL_INDICATORS.values())
+    features = FeatureMatrix(df.index, capacity=capacity)
+    for indicator in ALL_INDICATORS.keys():
+        data._iterate_indicator_params(features, indicator, sym, ohlct)
+    if not len(features):
+        return None, list(), dict(), rows
+    block, out = share_array(features.values, track=False)
+    block.close()
+    return out, list(features.columns), {c: data.specs[c][1] for c in features.columns}, rows
+
+
+def _fit_and_score(estimator: Pipeline, X: pd.DataFrame, y: pd.Series,
+                   train: np.ndarray, val: np.ndarray) -> tuple:
+    """Fit an estimator on the training rows of a fold and score it on the
+    validation rows, returning the score and the fit and score times."""
+    start = time.perf_counter()
+    estimator.fit(X.iloc[train], y.iloc[train])
+    fitted = time.perf_counter()
+    score = estimator.score(X.iloc[val], y.iloc[val])
+    return score, fitted - start, time.perf_counter() - fitted
+
+
 class RandomForest:
 
-    def __init__(self, data: MLDataset, **params):
+    def __init__(self, data: MLDataset, n_jobs: int = None, search: str = "grid",
+                 factor: int = 3, cache: bool = True, **params):
+        """Search for the best parameters of a random forest regressor on the
+        training set of a dataset, validating on its walk-forward folds.
+
+        Args:
+            data: dataset which has been split with `split_xy`.
+            n_jobs: number of processes to fit candidates/folds in parallel.
+            search: `grid` to fit every candidate on every fold, or `halving`
+                for successive halving: all candidates are first fitted on the
+                most recent rows of each fold's training set, and only the best
+                1/`factor` go on to each next round with `factor` times more
+                rows, until the last round fits on the full training sets.
+            factor: proportion of candidates kept in each halving round.
+            cache: cache the fitted scaler of each fold in a temp directory,
+                so it's only fitted once per fold rather than per candidate.
+            params: lists of values of `n_estimators`, `criterion` and
+                `max_depth` to search.
+        """
+        assert search in ("grid", "halving"), f"Invalid search `{search}`, valid options are: grid, halving"
         self.data = data
         self.train_X = data.train_X
         self.train_y = data.train_y
@@ -246,9 +747,183 @@ class RandomForest:
             "rf__max_depth": params.get("max_depth", [2, 5, 10, None]),
         }
 
+        cache_dir = tempfile.mkdtemp(prefix="rf_cache_", dir=io_path("temp", make_subdirs=True)) if cache else None
         pipe = Pipeline([
             ("scale", StandardScaler()),
             ("rf", RandomForestRegressor())
-        ])
-        self.gs = GridSearchCV(pipe, param_grid=param_grid, cv=self.data.val_ix)
+        ], memory=cache_dir)
+        try:
+            if search == "grid":
+                self._grid_search(pipe, param_grid, n_jobs)
+            else:
+                self._halving_search(pipe, param_grid, factor, n_jobs)
+        finally:
+            if cache_dir:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+        self.best_estimator.set_params(memory=None)
+
+    def _grid_search(self, pipe: Pipeline, param_grid: dict, n_jobs: int = None):
+        self.gs = GridSearchCV(pipe, param_grid=param_grid, cv=list(self.data.folds()), n_jobs=n_jobs)
         self.gs.fit(self.train_X, self.train_y)
+        self.best_params = self.gs.best_params_
+        self.best_estimator = self.gs.best_estimator_
+        results = self.gs.cv_results_
+        n_folds = self.gs.n_splits_
+        self.timings = pd.DataFrame(list(results["params"]))
+        self.timings["round"] = 0
+        self.timings["n_samples"] = len(self.train_X)
+        self.timings["fit_time"] = results["mean_fit_time"] * n_folds
+        self.timings["score_time"] = results["mean_score_time"] * n_folds
+        self.timings["mean_score"] = results["mean_test_score"]
+
+    def _halving_search(self, pipe: Pipeline, param_grid: dict, factor: int = 3,
+                        n_jobs: int = None):
+        assert factor > 1, "Halving factor must be greater than 1"
+        self.gs = None
+        candidates = list(ParameterGrid(param_grid))
+        folds = list(self.data.folds())
+        max_rows = max(len(train) for train, _ in folds)
+        n_rounds = max(int(np.ceil(np.log(len(candidates)) / np.log(factor))), 1)
+        timings = list()
+        for i in range(n_rounds):
+            # The most recent rows of each fold's training set are used:
+            n_rows = max(int(max_rows / factor ** (n_rounds - 1 - i)), 1)
+            results = Parallel(n_jobs=n_jobs)(
+                delayed(_fit_and_score)(clone(pipe).set_params(**p), self.train_X, self.train_y, train[-n_rows:], val)
+                for p in candidates for train, val in folds)
+            results = np.array(results).reshape(len(candidates), len(folds), 3)
+            scores = results[:, :, 0].mean(axis=1)
+            for p, score, (fit_time, score_time) in zip(candidates, scores, results[:, :, 1:].sum(axis=1)):
+                timings.append(dict(p, round=i, n_samples=n_rows, fit_time=fit_time, score_time=score_time,
+                                    mean_score=score))
+            order = np.argsort(-scores, kind="stable")
+            keep = 1 if i == n_rounds - 1 else int(np.ceil(len(candidates) / factor))
+            candidates = [candidates[j] for j in order[:keep]]
+        self.best_params = candidates[0]
+        self.best_estimator = clone(pipe).set_params(**self.best_params).fit(self.train_X, self.train_y)
+        self.timings = pd.DataFrame(timings)
+
+
+class WalkForward:
+
+    def __init__(self, data: MLDataset, estimator: object = None, step: int = 1,
+                 window: int = None, step_estimators: int = 10, max_estimators: int = None,
+                 incremental: bool = True):
+        """Walk-forward retraining harness: starting from the training set of a
+        dataset which has been split with `split_xy`, predict the next `step`
+        rows of the test set, then move the training window forward over them
+        and update the model, until the end of the data. The features are the
+        columns of `X` already computed for every row, so each step only slices
+        them. Training sets end `purge` + `embargo` rows (see `split_xy`) before
+        the rows they predict.
+
+        Models are updated incrementally where the estimator supports it:
+
+            partial_fit: models with a `partial_fit` method (e.g. SGDRegressor)
+                are only fitted on the rows added to the training window.
+            warm_start: forests with `warm_start` keep their trees and add
+                `step_estimators` trees fitted on the current window, dropping
+                the oldest trees beyond `max_estimators`, so the forest (and
+                the time to predict with it) doesn't grow with every step.
+            refit: anything else (or with `incremental` False) is refitted on
+                the current window from scratch.
+
+        For a Pipeline, the steps before the model (e.g. a scaler) are fitted
+        once on the initial training set, so the model's inputs don't change
+        scale between updates.
+
+        Args:
+            data: dataset which has been split with `split_xy`.
+            estimator: sklearn estimator or Pipeline, or a fitted `RandomForest`
+                search whose best estimator is used. Defaults to a scaled random
+                forest.
+            step: number of rows to predict before each update.
+            window: max number of rows to train on, otherwise the training set
+                expands with each step.
+            step_estimators: number of trees added in each warm start update.
+            max_estimators: max number of trees kept in a warm start forest,
+                defaults to the estimator's `n_estimators`.
+            incremental: update models incrementally if they support it.
+        """
+        if isinstance(estimator, RandomForest):
+            estimator = estimator.best_estimator
+        elif estimator is None:
+            estimator = Pipeline([
+                ("scale", StandardScaler()),
+                ("rf", RandomForestRegressor(n_estimators=100))
+            ])
+        self.data = data
+        self.step = step
+        self.window = window if window else data.fold_params.get("max_train_size")
+        self.step_estimators = step_estimators
+        self.max_estimators = max_estimators
+
+        estimator = clone(estimator)
+        if isinstance(estimator, Pipeline):
+            self.transform, self.model = Pipeline(estimator.steps[:-1]), estimator.steps[-1][1]
+        else:
+            self.transform, self.model = None, estimator
+        params = self.model.get_params()
+        if incremental and hasattr(self.model, "partial_fit"):
+            self.mode = "partial_fit"
+        elif incremental and "warm_start" in params and "n_estimators" in params:
+            self.mode = "warm_start"
+        else:
+            self.mode = "refit"
+        if self.mode == "warm_start" and not self.max_estimators:
+            self.max_estimators = params["n_estimators"]
+        self.predictions = pd.Series(dtype="float64", name=data.y.name)
+        self.timings = pd.DataFrame()
+
+    @property
+    def n_estimators(self):
+        return len(getattr(self.model, "estimators_", [])) or None
+
+    def _update(self, X: np.ndarray, y: np.ndarray, train: slice, previous: slice):
+        """Update the model for the training window `train`, given the window
+        it was last fitted on."""
+        if self.mode == "refit" or previous is None:
+            if self.mode == "warm_start":
+                self.model.set_params(warm_start=True)
+            self.model.fit(X[train], y[train])
+        elif self.mode == "partial_fit":
+            new = slice(max(previous.stop, train.start), train.stop)
+            if new.stop > new.start:
+                self.model.partial_fit(X[new], y[new])
+        else:
+            if self.max_estimators:
+                # Drop the oldest trees so the forest has room for the new ones:
+                n_trees = len(self.model.estimators_)
+                keep = min(max(self.max_estimators - self.step_estimators, 0), n_trees)
+                self.model.estimators_ = self.model.estimators_[n_trees - keep:]
+            self.model.set_params(n_estimators=len(self.model.estimators_) + self.step_estimators)
+            self.model.fit(X[train], y[train])
+
+    def run(self, verbose: bool = False) -> pd.Series:
+        """Walk forward through the test set, returning a Series of the
+        predictions. Per-step fit and predict times are saved in `timings`."""
+        data = self.data
+        gap = data.fold_params.get("purge", 0) + data.fold_params.get("embargo", 0)
+        X, y = data.X.to_numpy(dtype="float64"), data.y.to_numpy(dtype="float64")
+        if self.transform is not None:
+            X = self.transform.fit(X[data.train_ix], y[data.train_ix]).transform(X)
+
+        predictions, timings, previous = np.full(len(y), np.nan), list(), None
+        steps = walk_forward_steps(len(y), data.test_ix.start, self.step, gap=gap, window=self.window)
+        for i, (train, predict) in enumerate(steps):
+            start = time.perf_counter()
+            self._update(X, y, train, previous)
+            fitted = time.perf_counter()
+            predictions[predict] = self.model.predict(X[predict])
+            predicted = time.perf_counter()
+            previous = train
+            timings.append({"datetime": data.X.index[predict.start], "n_train": train.stop - train.start,
+                            "n_predict": predict.stop - predict.start, "n_estimators": self.n_estimators,
+                            "fit_time": fitted - start, "predict_time": predicted - fitted})
+            if verbose:
+                print(f"Step {i:,} ({timings[-1]['datetime']}): fit {fitted - start:.3f}s, "
+                      f"predict {predicted - fitted:.3f}s")
+
+        self.predictions = pd.Series(predictions[data.test_ix], index=data.test_X.index, name=data.y.name)
+        self.timings = pd.DataFrame(timings).set_index("datetime")
+        return self.predictions
@@ -0,0 +1,171 @@
+"""Resampling of price data into OHLC bars of a lower frequency, e.g. 1 minute
+data into 5 minute, hourly or daily bars. Bars are built in one vectorised pass:
+every row's timestamp is floored to the start of its bar, and the prices of each
+contiguous run of rows in the same bar are reduced with `numpy.ufunc.reduceat`.
+`BarCache` saves the bars built from each source of data (e.g. a year file or a
+symbol) at a frequency, and when rows are appended to a source only the bars
+from the end of the cached data onwards are rebuilt."""
+
+import numpy as np
+import os
+import pandas as pd
+
+from thales.config.cache import load_yaml, save_yaml
+from thales.config.schemas import parse_datetime_column
+
+
+BAR_COLS = ("open", "high", "low", "close", "volume")
+_BAR_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def bar_starts(dt: np.ndarray, freq: str) -> np.ndarray:
+    """Floor int64 nanosecond timestamps to the start of their bar."""
+    offset = pd.tseries.frequencies.to_offset(freq)
+    try:
+        step = offset.nanos
+    except ValueError:  # Calendar frequencies (e.g. weeks, months) have no fixed length.
+        periods = pd.DatetimeIndex(dt.view("datetime64[ns]")).to_period(offset)
+        return periods.start_time.to_numpy(dtype="datetime64[ns]").view("i8")
+    return dt - dt % step
+
+
+def resample_ohlc(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Resample price data into OHLC bars with frequency `freq` (e.g. `5min`,
+    `1H`, `1D`, `W`), summing the volume if there is a volume column. The data
+    must be sorted by datetime, and first by symbol if it has a `symbol` column.
+    Bars are labelled by their start datetime, and periods without data have no
+    bar. The datetime can be the index or a `datetime` column, and the bars are
+    returned in the same format."""
+    on_index = "datetime" not in df.columns
+    dt = df.index if on_index else df["datetime"]
+    starts = bar_starts(dt.to_numpy(dtype="datetime64[ns]").view("i8"), freq)
+    cols = [c for c in BAR_COLS if c in df.columns]
+
+    new_bar = np.r_[True, starts[1:] != starts[:-1]] if len(df) else np.zeros(0, dtype=bool)
+    if "symbol" in df.columns:
+        codes = pd.factorize(df["symbol"])[0]
+        new_bar[1:] |= codes[1:] != codes[:-1]
+    first = np.flatnonzero(new_bar)
+    last = np.r_[first[1:], len(df)] - 1
+
+    bars = dict()
+    for c in cols:
+        values = df[c].to_numpy(dtype="float64")
+        if not len(first):
+            bars[c] = values
+        elif c == "open":
+            bars[c] = values[first]
+        elif c == "close":
+            bars[c] = values[last]
+        else:
+            reduce = {"high": np.maximum, "low": np.minimum, "volume": np.add}[c]
+            bars[c] = reduce.reduceat(values, first)
+    index = pd.DatetimeIndex(starts[first].view("datetime64[ns]"), name="datetime")
+    bars = pd.DataFrame(bars, index=index, columns=cols)
+    if "symbol" in df.columns:
+        bars.insert(0, "symbol", df["symbol"].iloc[first].to_numpy())
+    return bars if on_index else bars.reset_index()
+
+
+def _symbol_order(df: pd.DataFrame, dt: pd.Series) -> np.ndarray:
+    """Stable row order by symbol (if any) then datetime."""
+    dt = dt.to_numpy(dtype="datetime64[ns]").view("i8")
+    if "symbol" not in df.columns:
+        return np.argsort(dt, kind="stable")
+    return np.lexsort((dt, df["symbol"].astype(str).to_numpy()))
+
+
+def update_bars(bars: pd.DataFrame, df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Extend bars with new rows of price data which all come after the data
+    the bars were built from. The last bar (of each symbol) may have been
+    incomplete, so it is rebuilt from its old values and the new rows in the
+    same period; all other bars are kept as they are."""
+    on_index = "datetime" not in bars.columns
+    bars, df = (bars.reset_index(), df.reset_index()) if on_index else (bars, df)
+    if "symbol" in bars.columns:
+        is_last = np.r_[bars["symbol"].to_numpy()[1:] != bars["symbol"].to_numpy()[:-1], True]
+    else:
+        is_last = np.arange(len(bars)) == len(bars) - 1
+    # An old bar resamples into itself, so it can be merged with the new rows:
+    new = pd.concat([bars.loc[is_last], df[[c for c in bars.columns if c in df.columns]]], sort=False)
+    new = new.iloc[_symbol_order(new, new["datetime"])]
+    updated = pd.concat([bars.loc[~is_last], resample_ohlc(new, freq)], sort=False)
+    updated = updated.iloc[_symbol_order(updated, updated["datetime"])].reset_index(drop=True)
+    return updated.set_index("datetime") if on_index else updated
+
+
+class BarCache:
+    """Bars resampled at one frequency from sources of price data, saved as CSV
+    files named by a key for each source (e.g. a year or a symbol). Each file's
+    metadata records the version of the source it was built from (e.g. a file
+    modification time or a catalog checksum), and the last datetime, row count
+    and a hash of the source's data."""
+
+    def __init__(self, directory: str, freq: str):
+        self.freq = freq
+        self.directory = os.path.join(directory, freq)
+
+    def _paths(self, key: str) -> tuple:
+        return os.path.join(self.directory, f"{key}.csv"), os.path.join(self.directory, f"{key}.yaml")
+
+    def get(self, key: str, version: object, load: callable) -> pd.DataFrame:
+        """Bars for a source, read from the cache if they were built from the
+        same version of the source, otherwise built from the DataFrame returned
+        by calling `load`. If rows have only been appended to the source since
+        the bars were cached, only the new rows are resampled."""
+        fp, meta_fp = self._paths(key)
+        meta = load_yaml(meta_fp) if os.path.exists(meta_fp) else None
+        if meta and meta["version"] == version and os.path.exists(fp):
+            return self._read(fp, meta)
+        df = load()
+        bars = None
+        if meta and os.path.exists(fp):
+            new = self._appended(df, meta)
+            if new is not None:
+                bars = update_bars(self._read(fp, meta), new, self.freq)
+        if bars is None:
+            bars = resample_ohlc(df, self.freq)
+        self._save(key, bars, df, version)
+        return bars
+
+    @staticmethod
+    def _datetimes(df: pd.DataFrame) -> pd.Series:
+        return df["datetime"] if "datetime" in df.columns else df.index.to_series()
+
+    @staticmethod
+    def _fingerprint(df: pd.DataFrame) -> str:
+        """Hash of a source's datetimes and prices, for checking whether rows
+        which have already been resampled have since changed."""
+        df = df.reset_index() if "datetime" not in df.columns else df
+        cols = ["datetime"] + [c for c in BAR_COLS if c in df.columns] + (["symbol"] if "symbol" in df.columns else [])
+        return str(int(pd.util.hash_pandas_object(df[cols], index=False).to_numpy().sum(dtype="uint64")))
+
+    def _appended(self, df: pd.DataFrame, meta: dict):
+        """The rows of a source added after the cached bars were built, or None
+        if any of the source's earlier rows have changed too."""
+        dt = self._datetimes(df)
+        last = pd.Timestamp(meta["last"]) if meta["last"] else None
+        if last is None:
+            return None
+        old = (dt <= last).to_numpy()
+        if int(old.sum()) != meta["rows"] or self._fingerprint(df.loc[old]) != meta["fingerprint"]:
+            return None
+        return df.loc[~old]
+
+    def _read(self, fp: str, meta: dict) -> pd.DataFrame:
+        bars = pd.read_csv(fp, encoding="utf-8")
+        bars["datetime"] = parse_datetime_column(bars["datetime"], _BAR_FORMAT)
+        return bars.set_index("datetime") if meta["index"] else bars
+
+    def _save(self, key: str, bars: pd.DataFrame, df: pd.DataFrame, version: object):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        fp, meta_fp = self._paths(key)
+        on_index = "datetime" not in bars.columns
+        (bars.reset_index() if on_index else bars).to_csv(fp, encoding="utf-8", index=False,
+                                                          date_format=_BAR_FORMAT)
+        dt = self._datetimes(df)
+        last = dt.max() if len(dt) else None
+        meta = {"version": version, "index": on_index, "rows": len(dt), "fingerprint": self._fingerprint(df),
+                "last": None if last is None else pd.Timestamp(last).strftime(_BAR_FORMAT)}
+        save_yaml(meta, meta_fp)
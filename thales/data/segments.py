@@ -0,0 +1,67 @@
+"""Append-only storage for scraped data. The first scrape of a symbol is saved
+as the symbol's base CSV file (e.g. `AAPL.csv`), and each later scrape is saved
+as a small segment file named by its request time, rather than re-loading and
+re-writing the whole history. `CSVLoader` merges the base file and segments
+when loading, and `CSVLoader.compact` periodically folds the segments back into
+the base file."""
+
+import os
+import pandas as pd
+import warnings
+
+from thales.config.paths import io_path
+from thales.config.sources import validate_source
+from thales.config.utils import DEFAULT_SUBDIR
+
+
+def segment_dir(sym: str, src: str = None, subdir: str = None,
+                make_subdirs: bool = False) -> str:
+    """Path to the directory storing a symbol's scrape segments."""
+    subdir = DEFAULT_SUBDIR if not subdir else subdir
+    return io_path("scraped_data", validate_source(src), subdir, "segments", str.upper(sym),
+                   make_subdirs=make_subdirs)
+
+
+def list_segments(sym: str, src: str = None, subdir: str = None) -> list:
+    """Filepaths of all segments saved for a symbol, from oldest to newest. The
+    request time filenames sort chronologically as strings."""
+    directory = segment_dir(sym, src=src, subdir=subdir)
+    if not os.path.isdir(directory):
+        return list()
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".csv")]
+
+
+def write_segment(df: pd.DataFrame, sym: str, request_time: str,
+                  src: str = None, subdir: str = None) -> str:
+    """Save a newly scraped DataFrame as a segment of a symbol's data. If the
+    symbol was already scraped within the same second the segment is given a
+    numbered suffix, which still sorts after the earlier segment."""
+    directory = segment_dir(sym, src=src, subdir=subdir, make_subdirs=True)
+    fp, n = os.path.join(directory, f"{request_time}.csv"), 0
+    while os.path.exists(fp):
+        n += 1
+        fp = os.path.join(directory, f"{request_time}_{n}.csv")
+    atomic_to_csv(df, fp)
+    return fp
+
+
+def atomic_to_csv(df: pd.DataFrame, fp: str):
+    """Save a DataFrame to CSV via a temporary file which then replaces the
+    target, so readers never see a partially written file."""
+    temp_fp = f"{fp}.tmp"
+    df.to_csv(temp_fp, encoding="utf-8", index=False)
+    os.replace(temp_fp, fp)
+
+
+def check_compactions(futures: list) -> list:
+    """Wait for background compactions (a list of tuples of name and the Future
+    of its compaction) and warn about each one which failed. A failed
+    compaction leaves the name's segments in place, so no data is lost. Returns
+    the names whose compaction failed."""
+    failed = list()
+    for name, future in futures:
+        e = future.exception()
+        if e is not None:
+            failed.append(name)
+            warnings.warn(f"Failed to compact segments of {name}: {type(e).__name__}: {e}")
+    return failed
@@ -0,0 +1,66 @@
+"""Calendar index of intraday price data. The index is built once from a sorted
+DatetimeIndex and holds the row offset at which each day starts, the day and
+hour of every row, and a sort key of day and hour, so that aggregates over a
+trading session window of each day (e.g. the max high between 06:00 and 07:59)
+are a single `numpy.ufunc.reduceat` call rather than a groupby."""
+
+import numpy as np
+import pandas as pd
+
+
+NS_PER_HOUR = 3600 * 10 ** 9
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+
+class SessionIndex:
+    """Day and hour index of a sorted DatetimeIndex."""
+
+    def __init__(self, index: pd.DatetimeIndex):
+        dt = pd.DatetimeIndex(index).to_numpy(dtype="datetime64[ns]").view("i8")
+        assert not len(dt) or (np.diff(dt) >= 0).all(), "Index must be sorted"
+        day = dt // NS_PER_DAY
+        new_day = np.r_[True, day[1:] != day[:-1]] if len(dt) else np.zeros(0, dtype=bool)
+        self.day_starts = np.flatnonzero(new_day)
+        self.day_of_row = np.cumsum(new_day) - 1
+        self.days = pd.DatetimeIndex((day[self.day_starts] * NS_PER_DAY).view("datetime64[ns]"), name="date")
+        self.hours = ((dt - day * NS_PER_DAY) // NS_PER_HOUR).astype("int8")
+        self._key = day * 24 + self.hours
+
+    def __len__(self):
+        return len(self.hours)
+
+    @property
+    def dates(self) -> np.ndarray:
+        """Array of the `datetime.date` of every row."""
+        return self.days.date[self.day_of_row]
+
+    def window_mask(self, start_hour: int, end_hour: int) -> np.ndarray:
+        """Boolean array of the rows in the hours `start_hour` to `end_hour`
+        inclusive (e.g. 6 and 7 for 06:00 to 07:59)."""
+        return (self.hours >= start_hour) & (self.hours <= end_hour)
+
+    def window_bounds(self, start_hour: int, end_hour: int) -> tuple:
+        """Arrays of the first and last+1 row positions of each day's window."""
+        day_key = self._key[self.day_starts] - self.hours[self.day_starts]
+        return np.searchsorted(self._key, day_key + start_hour, side="left"), \
+            np.searchsorted(self._key, day_key + end_hour, side="right")
+
+    def window_aggregate(self, values: object, func: np.ufunc, start_hour: int,
+                         end_hour: int) -> np.ndarray:
+        """Aggregate `values` over each day's window with a numpy ufunc (e.g.
+        `np.fmax` to ignore NaNs). Returns an array with one value per day in
+        `days`, which is NaN for days without any rows in the window."""
+        values = np.asarray(values, dtype="float64")
+        starts, ends = self.window_bounds(start_hour, end_hour)
+        out = np.full(len(starts), np.nan)
+        valid = starts < ends
+        if valid.any():
+            bounds = np.c_[starts[valid], ends[valid]].ravel()
+            if bounds[-1] == len(values):
+                bounds = bounds[:-1]
+            out[valid] = func.reduceat(values, bounds)[::2]
+        return out
+
+    def to_rows(self, day_values: np.ndarray) -> np.ndarray:
+        """Broadcast an array of one value per day to every row of the day."""
+        return np.asarray(day_values)[self.day_of_row]
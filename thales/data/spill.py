@@ -0,0 +1,61 @@
+"""Columns of a DataFrame spilled from memory to disk. Each column is saved as
+a float64 `.npy` file in a directory under `.thales_IO/temp` that is deleted
+when the spill is garbage collected, and is read back through a memory map, so
+only the pages of a column that are actually used are loaded into memory."""
+
+from itertools import count
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+import weakref
+
+from thales.config.paths import io_path
+
+
+class ColumnSpill:
+    """Float columns spilled to memory-mapped files, keyed by column name."""
+
+    def __init__(self, prefix: str = "spill_"):
+        self.directory = tempfile.mkdtemp(prefix=prefix, dir=io_path("temp", make_subdirs=True))
+        self.columns = dict()  # Maps column name to tuple of (filepath, index).
+        self._ids = count()
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def __contains__(self, name: str):
+        return name in self.columns
+
+    def __len__(self):
+        return len(self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the spilled columns on disk."""
+        return sum(os.path.getsize(fp) for fp, _ in self.columns.values())
+
+    def spill(self, df: pd.DataFrame):
+        """Save every column of a DataFrame to disk."""
+        for c in df.columns:
+            fp = os.path.join(self.directory, f"{next(self._ids)}.npy")
+            np.save(fp, df[c].to_numpy(dtype="float64"))
+            self.columns[c] = (fp, df.index)
+
+    def get(self, name: str, index: pd.Index = None) -> np.ndarray:
+        """Memory-mapped array of a spilled column, reindexed to `index` if it
+        is passed and differs from the index the column was spilled with."""
+        fp, spilled_index = self.columns[name]
+        values = np.load(fp, mmap_mode="r")
+        if index is None or index.equals(spilled_index):
+            return values
+        return pd.Series(values, index=spilled_index).reindex(index).to_numpy()
+
+    def pop(self, *names: str, index: pd.Index) -> pd.DataFrame:
+        """Read spilled columns back into memory as a DataFrame with `index`,
+        and delete their files."""
+        values = np.empty((len(names), len(index)), dtype="float64")
+        for i, name in enumerate(names):
+            values[i] = self.get(name, index)
+        for name in names:
+            os.remove(self.columns.pop(name)[0])
+        return pd.DataFrame(values.T, index=index, columns=list(names), copy=False)
@@ -0,0 +1,52 @@
+"""Train/validation/test splits of time series data, represented by row
+positions rather than copies of the data. Walk-forward folds (and the steps of
+walk-forward retraining) are generated lazily, one at a time, and can leave a
+gap between each training set and the validation set after it: `purge` rows
+whose labels look ahead into the validation set (e.g. the horizon of a future
+returns label) and `embargo` rows whose features are serially correlated with
+it."""
+
+import numpy as np
+
+
+def holdout(n: int, test_size: float, gap: int = 0) -> tuple:
+    """Slices of the training and test rows of `n` rows, with the last
+    `test_size` fraction of rows in the test set and `gap` rows between the
+    training set and the test set."""
+    assert 0 < test_size < 1, f"Invalid test_size, should be float between 0 and 1: {test_size}"
+    test_n = int(test_size * n)
+    assert test_n > 0, f"No test rows in {n:,} rows with test_size {test_size}"
+    return slice(0, max(n - test_n - gap, 0)), slice(n - test_n, n)
+
+
+def walk_forward_folds(n: int, n_splits: int = 5, purge: int = 0,
+                       embargo: int = 0, max_train_size: int = None):
+    """Generate walk-forward (train, validation) arrays of row positions for `n`
+    rows, in the same folds as `sklearn.model_selection.TimeSeriesSplit`: the
+    rows are divided into `n_splits` + 1 blocks and each fold validates on the
+    next block after the training set. Training sets end `purge` + `embargo`
+    rows before their validation set, and are limited to the last
+    `max_train_size` rows if it's passed."""
+    val_size = n // (n_splits + 1)
+    assert val_size > 0, f"Too many splits ({n_splits}) for {n:,} rows"
+    gap = purge + embargo
+    for start in range(n - n_splits * val_size, n, val_size):
+        end = start - gap
+        assert end > 0, f"No training rows before row {start:,} with a gap of {gap:,} rows"
+        train_start = 0 if max_train_size is None else max(end - max_train_size, 0)
+        yield np.arange(train_start, end), np.arange(start, start + val_size)
+
+
+def walk_forward_steps(n: int, start: int, step: int = 1, gap: int = 0,
+                       window: int = None):
+    """Generate (train, predict) slices of row positions walking forward through
+    `n` rows from row `start`, predicting `step` rows at a time. Each training
+    set ends `gap` rows before the rows it predicts (see `walk_forward_folds`),
+    and is limited to the last `window` rows if it's passed (otherwise it
+    expands with every step)."""
+    assert step > 0, "Step must be a positive number of rows"
+    assert start - gap > 0, f"No training rows before row {start:,} with a gap of {gap:,} rows"
+    for t in range(start, n, step):
+        end = t - gap
+        train_start = 0 if window is None else max(end - window, 0)
+        yield slice(train_start, end), slice(t, min(t + step, n))
@@ -1,28 +1,131 @@
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import datetime
+import numpy as np
 import os
 import pandas as pd
+import warnings
 
 from thales.config.paths import package_path
+from thales.config.schemas import get_dataset_schema, parse_datetime_column, read_schema_csv
 from thales.config.utils import parse_datetime, PRICE_COLS
+from thales.data.gaps import day_report, window_days
+from thales.data.minute_store import MinuteStore, open_store
+from thales.data.resample import BarCache, resample_ohlc
+from thales.data.sessions import SessionIndex
+
+
+OPERATORS = {"g": np.greater, "ge": np.greater_equal, "l": np.less, "le": np.less_equal}
+
+
+def compile_conditions(*condition: str) -> list:
+    """Parse conditions in format `{column}_{operator}_{value}` into a list of
+    tuples of (column, numpy comparison function, float value)."""
+    assert condition, "No conditions passed"
+    compiled = list()
+    for cond in condition:
+        column, operator, value = cond.rsplit("_", 2)
+        assert operator in OPERATORS, f"Invalid operator: {operator}"
+        compiled.append((column, OPERATORS[operator], float(value)))
+    return compiled
+
+
+def condition_mask(df: pd.DataFrame, conditions: list) -> np.ndarray:
+    """Boolean array of the rows meeting any of the compiled conditions."""
+    mask = np.zeros(len(df), dtype=bool)
+    for column, operator, value in conditions:
+        assert column in df.columns, f"Invalid column: {column}"
+        mask |= operator(df[column].to_numpy(dtype="float64"), value)
+    return mask
+
+
+def read_year_csv(data_dir: str, year: int, schema: dict = None) -> pd.DataFrame:
+    """Open a raw CSV file containing a year's data from a dataset directory."""
+    fp = os.path.join(data_dir, f"{year}.csv")
+    schema = get_dataset_schema(data_dir) if schema is None else schema
+    try:
+        df = read_schema_csv(fp, schema)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No data available for year: {year}")
+    for c in df.columns:
+        if "date" in c:
+            df[c] = parse_datetime_column(df[c])
+    return df
+
+
+def _partition_fp(data_dir: str, kind: str, year: int) -> str:
+    return os.path.join(data_dir, kind, f"{year}.csv")
+
+
+def partition_stale(data_dir: str, kind: str, year: int) -> bool:
+    """True if a year's partition of a kind of summary data (e.g. `stats`)
+    hasn't been saved since the year's CSV changed."""
+    fp = _partition_fp(data_dir, kind, year)
+    if not os.path.exists(fp):
+        return True
+    return os.path.getmtime(os.path.join(data_dir, f"{year}.csv")) > os.path.getmtime(fp)
+
+
+def _save_partition(df: pd.DataFrame, data_dir: str, kind: str, year: int):
+    fp = _partition_fp(data_dir, kind, year)
+    if not os.path.isdir(os.path.dirname(fp)):
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+    df.to_csv(fp, encoding="utf-8", index=True)
+
+
+def build_year_stats(data_dir: str, year: int) -> pd.DataFrame:
+    """Build and save a CSV of monthly statistics about a year's data."""
+    df = read_year_csv(data_dir, year)
+    df["year"], df["month"] = df["datetime"].dt.year, df["datetime"].dt.month
+    stats = df.groupby(["year", "month"])[list(PRICE_COLS)].agg({c: ["min", "max"] for c in PRICE_COLS})
+    stats.index.names = ["Year", "Month"]
+    _save_partition(stats, data_dir, "stats", year)
+    return stats
+
+
+def build_year_gaps(data_dir: str, year: int) -> pd.DataFrame:
+    """Build and save a CSV of the daily gaps and duplicates in a year's data."""
+    df = read_year_csv(data_dir, year)
+    report = day_report(df["datetime"].sort_values(kind="mergesort"))
+    _save_partition(report, data_dir, "gaps", year)
+    return report
 
 
 class TestDataset:
     """Class for handling test datasets for back-testing strategies."""
 
     def __init__(self, name: str, start_date: object = None,
-                 end_date: object = None):
+                 end_date: object = None, prefetch: bool = False):
         """Class for interacting with locally stored historical data.
 
         Args:
             name: valid name of a test dataset.
             start_date: string or datetime representing the back-test start.
             end_date: string or datetime representing the back-test end.
+            prefetch: if True, after loading a year's CSV file the next year's
+                file is read in a background thread, ready for when the test
+                reaches it.
         """
         self.df = pd.DataFrame(columns=list(PRICE_COLS)+["datetime"]).set_index(["datetime"])
+        self.loaded_years = set()
+        self.prefetch = prefetch
+        self._prefetched = dict()  # Maps year to Future of its CSV DataFrame.
+        self._executor = None
+        self._sessions = None
         data_dir = package_path("data", "toy_datasets", name)
         assert os.path.exists(data_dir), f"Invalid data directory name: {name}"
         self.data_dir = data_dir
+        self.schema = get_dataset_schema(data_dir)
+        self.store = open_store(data_dir)
+        if self.store is not None and self.store.is_stale():
+            warnings.warn(f"Binary store for {name} is out of date so CSVs will be used, "
+                          f"call `build_store` to rebuild it.")
+            self.store = None
+        missing = self.store.missing_columns() if self.store is not None else None
+        if missing:
+            warnings.warn(f"Binary store for {name} doesn't hold columns {', '.join(missing)} so CSVs will "
+                          f"be used, call `build_store` to rebuild it.")
+            self.store = None
         self.name = name
         self.start_date = parse_datetime(start_date)
         self.end_date = parse_datetime(end_date)
@@ -33,30 +136,77 @@ class TestDataset:
         """Load data to the `df` attribute between the 2 dates."""
         self.start_date = parse_datetime(start_date)
         self.end_date = parse_datetime(end_date)
-        years = list(range(self.start_date.year, self.end_date.year + 1, 1))
-        for y in years:
-            self.load_year(y)
-        self.df = self.df.loc[(self.df.index >= self.start_date) & (self.df.index <= self.end_date)]
+        if self.store is not None:  # Slice the date range directly from the store:
+            self.df = self.store.frame(self.start_date, self.end_date)
+        else:
+            years = list(range(self.start_date.year, self.end_date.year + 1, 1))
+            self.load_years(*years)
+            i = self._data.index.searchsorted(self.start_date, side="left")
+            j = self._data.index.searchsorted(self.end_date, side="right")
+            self.df = self._data.iloc[i:j]
+        # Only years which are loaded in full, so jumps outside the dates load the rest:
+        first_year = self.start_date.year + int(self.start_date > datetime.datetime(self.start_date.year, 1, 1))
+        last_year = self.end_date.year - int(self.end_date.date() < datetime.date(self.end_date.year, 12, 31))
+        self.loaded_years = set(range(first_year, last_year + 1))
+        self.year = self.end_date.year
+
+    def build_store(self):
+        """Convert the dataset's year CSVs into a memory-mapped binary store,
+        which is then used to load data instead of parsing the CSVs."""
+        self.store = MinuteStore.build(self.data_dir)
+
+    def _update_partitions(self, kind: str, build: callable):
+        """Rebuild the partitions of a kind of summary data (e.g. `stats`) for
+        the years whose CSV file has changed since, in parallel processes.
+        Returns the list of years rebuilt."""
+        stale = [y for y in self.available_years if partition_stale(self.data_dir, kind, y)]
+        if len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(stale), os.cpu_count() or 1)) as pool:
+                list(pool.map(build, [self.data_dir] * len(stale), stale))
+        elif stale:
+            build(self.data_dir, stale[0])
+        return stale
 
     def _build_stats(self):
-        """Build and save a CSV of statistics about the dataset."""
-        stats = pd.DataFrame()
-        for year in self.available_years:
-            df = self.open_year_csv(year)
-            df["year"], df["month"] = df["datetime"].dt.year, df["datetime"].dt.month
-            year_stats = df.groupby(["year", "month"])[PRICE_COLS].agg({c: ["min", "max"] for c in PRICE_COLS})
-            stats = stats.append(year_stats, sort=False)
-        stats.index.names = ["Year", "Month"]
-        stats.to_csv(os.path.join(self.data_dir, "stats.csv"), encoding="utf-8", index=True)
+        """Build and save a CSV of statistics about the dataset. Statistics are
+        saved for each year in the `stats` sub-directory, and only the years
+        whose CSV file has changed since are rebuilt."""
+        stale = self._update_partitions("stats", build_year_stats)
+        stats = pd.concat([pd.read_csv(_partition_fp(self.data_dir, "stats", y), encoding="utf-8", header=[0, 1],
+                                       index_col=[0, 1]) for y in self.available_years], sort=False)
+        fp = os.path.join(self.data_dir, "stats.csv")
+        if stale or not os.path.exists(fp):
+            stats.to_csv(fp, encoding="utf-8", index=True)
         return stats
 
+    @property
+    def gaps(self) -> pd.DataFrame:
+        """Report of the gaps and duplicates in each day of the dataset (see
+        `thales.data.gaps.day_report`). Reports are saved for each year in the
+        `gaps` sub-directory, and only rebuilt when the year's CSV changes."""
+        self._update_partitions("gaps", build_year_gaps)
+        reports = list()
+        for y in self.available_years:
+            report = pd.read_csv(_partition_fp(self.data_dir, "gaps", y), encoding="utf-8", index_col=0)
+            for c in ("first", "last"):
+                report[c] = parse_datetime_column(report[c])
+            report.index = pd.DatetimeIndex(parse_datetime_column(report.index.to_series()), name="date")
+            reports.append(report)
+        return pd.concat(reports, sort=False) if reports else day_report([])
+
+    def trading_days(self, start_hour: int = 0, end_hour: int = 23) -> pd.DatetimeIndex:
+        """Days in the dataset with data in the hours `start_hour` to `end_hour`
+        inclusive, from the cached gaps report."""
+        return window_days(self.gaps, start_hour=start_hour, end_hour=end_hour)
+
     @property
     def stats(self):
-        try:
-            fp = os.path.join(self.data_dir, "stats.csv")
-            return pd.read_csv(fp, encoding="utf-8", header=[0, 1], index_col=[0, 1])
-        except FileNotFoundError:
+        """Monthly min/max statistics for each price column. Datasets which only
+        include the `stats.csv` file and not the year CSVs use that file."""
+        if self.available_years:
             return self._build_stats()
+        fp = os.path.join(self.data_dir, "stats.csv")
+        return pd.read_csv(fp, encoding="utf-8", header=[0, 1], index_col=[0, 1])
 
     @property
     def available_years(self):
@@ -65,44 +215,153 @@ class TestDataset:
 
     def open_year_csv(self, year: int):
         """Open a raw CSV file containing a year's data."""
-        fp = os.path.join(self.data_dir, f"{year}.csv")
-        try:
-            df = pd.read_csv(fp, encoding="utf-8")
-            for c in df.columns:
-                if "date" in c:
-                    df[c] = pd.to_datetime(df[c])
-            return df
-        except FileNotFoundError:
+        return read_year_csv(self.data_dir, year, schema=self.schema)
+
+    def resample(self, freq: str, start: object = None,
+                 end: object = None) -> pd.DataFrame:
+        """OHLC bars of frequency `freq` (e.g. `5min`, `1H`, `1D`) built from
+        the dataset's data between the `start` and `end` dates. Bars are cached
+        per year in the dataset's `bars` sub-directory, and only rebuilt when
+        the year's CSV file changes."""
+        start, end = parse_datetime(start), parse_datetime(end)
+        cache = BarCache(os.path.join(self.data_dir, "bars"), freq)
+        years = self.store.years if self.store is not None else self.available_years
+        bars = list()
+        for year in years:
+            if (start and year < start.year) or (end and year > end.year):
+                continue
+            version = os.stat(os.path.join(self.data_dir, f"{year}.csv")).st_mtime_ns
+            bars.append(cache.get(str(year), version, lambda: self._open_years([year])[0]))
+        # Resampling again merges any bars split across two years (e.g. weeks):
+        bars = resample_ohlc(pd.concat(bars, sort=False), freq) if bars else pd.DataFrame()
+        i = 0 if start is None else bars.index.searchsorted(start, side="left")
+        j = len(bars) if end is None else bars.index.searchsorted(end, side="right")
+        return bars.iloc[i:j]
+
+    def open_year(self, year: int):
+        """DataFrame of a year's data, sliced from the binary store if it has
+        been built, otherwise parsed from the year's CSV file."""
+        if self.store is None:
+            return self.open_year_csv(year)
+        if year not in self.store.years:
             raise FileNotFoundError(f"No data available for year: {year}")
+        start, end = datetime.datetime(year, 1, 1), datetime.datetime(year, 12, 31, 23, 59, 59, 999999)
+        return self.store.frame(start, end).reset_index()
+
+    @property
+    def df(self):
+        """The loaded data from the current cursor position onwards. Moving the
+        cursor doesn't filter or copy the loaded data."""
+        if not self._pos:
+            return self._data
+        return self._data.iloc[self._pos:]
+
+    @df.setter
+    def df(self, df: pd.DataFrame):
+        """Replace all the loaded data and reset the cursor to its first row."""
+        self._data = df
+        self._pos = 0
+
+    @property
+    def sessions(self) -> SessionIndex:
+        """Day and hour index of all the loaded data, built once each time the
+        loaded data changes."""
+        if self._sessions is None or self._sessions[0] is not self._data.index:
+            self._sessions = (self._data.index, SessionIndex(self._data.index))
+        return self._sessions[1]
 
     @property
     def current_datetime(self):
-        """Current first datetime in the `df` attribute's index."""
-        return self.df.index[0].to_pydatetime()
+        """Datetime of the row at the current cursor position."""
+        return self._data.index[self._pos].to_pydatetime()
+
+    def _seek(self, dt: datetime.datetime):
+        """Move the cursor to the first loaded row at or after `dt`."""
+        self._pos = int(self._data.index.searchsorted(dt, side="left"))
 
     def load_year(self, year: int = None):
         """Append a year's data to the `df` attribute. If no argument is passed,
         loads the year after the latest loaded year."""
         if not year:
             year = self.year + 1
-        df = self.open_year_csv(year)
-        current_df = self.df.reset_index()
-        new_df = current_df.append(df, sort=False).drop_duplicates(subset=["datetime"])
-        self.df = new_df.set_index(["datetime"]).sort_index()
-        self.year = year
+        self.load_years(year)
+
+    def load_years(self, *years: int):
+        """Append several years' data to the `df` attribute, concatenating the
+        loaded and new data only once. Sorting is skipped when the years don't
+        overlap, which is always the case unless data has been duplicated."""
+        years = sorted(set(years))
+        self._add_frames(self._open_years(years), years)
+
+    def _add_frames(self, frames: list, years: list):
+        """Merge DataFrames of whole years' data into the loaded data."""
+        # Keep the cursor on the same row once the data has been re-ordered:
+        if self._pos < len(self._data):
+            current, side = self._data.index[self._pos], "left"
+        else:
+            current, side = (self._data.index[-1], "right") if len(self._data) else (None, "left")
+        frames = [df for df in [self._data] + frames if len(df)]
+        if frames:
+            self._data = self._concat_sorted(frames)
+        self._pos = 0 if current is None else int(self._data.index.searchsorted(current, side=side))
+        self.loaded_years.update(years)
+        self.year = max(self.loaded_years)
+        self._prefetch_year(self.year + 1)
+
+    def _open_years(self, years: list) -> list:
+        """List of `datetime` indexed DataFrames holding the years' data. From
+        the binary store this is a single slice covering all the years."""
+        if self.store is not None:
+            for year in years:
+                if year not in self.store.years:
+                    raise FileNotFoundError(f"No data available for year: {year}")
+            start = datetime.datetime(years[0], 1, 1)
+            end = datetime.datetime(years[-1], 12, 31, 23, 59, 59, 999999)
+            return [self.store.frame(start, end)]
+        frames = list()
+        for year in years:
+            future = self._prefetched.pop(year, None)
+            df = self.open_year_csv(year) if future is None else future.result()
+            df = df.drop_duplicates(subset=["datetime"]).set_index(["datetime"])
+            frames.append(df if df.index.is_monotonic_increasing else df.sort_index())
+        return frames
+
+    @staticmethod
+    def _concat_sorted(frames: list) -> pd.DataFrame:
+        """Concatenate sorted DataFrames into one sorted DataFrame, keeping the
+        first of any duplicated datetimes."""
+        if len(frames) == 1:
+            return frames[0]
+        ordered = sorted(frames, key=lambda df: df.index[0])
+        if all(a.index[-1] < b.index[0] for a, b in zip(ordered[:-1], ordered[1:])):
+            return pd.concat(ordered, sort=False)
+        df = pd.concat(frames, sort=False)
+        return df.loc[~df.index.duplicated(keep="first")].sort_index(kind="mergesort")
+
+    def _prefetch_year(self, year: int):
+        """Start reading a year's CSV file in a background thread."""
+        if not self.prefetch or self.store is not None or year in self._prefetched:
+            return
+        if year in self.loaded_years or year not in self.available_years:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetched[year] = self._executor.submit(self.open_year_csv, year)
 
     def jump_to_date(self, dt: object):
         """For a specific datetime, ensure the relevant year's data is loaded,
-        and then filter the `df` attribute so that it starts at the closest
-        available datetime which is greater/equal to `dt`."""
+        and then move the cursor so that the `df` attribute starts at the
+        closest available datetime which is greater/equal to `dt`. Jumps are a
+        binary search of the loaded index, and can go backwards as well as
+        forwards."""
         dt = parse_datetime(dt)
-        if dt.year != self.year:
+        if dt.year not in self.loaded_years:
             self.load_year(dt.year)
-        self.df = self.df.loc[self.df.index >= dt]
+        self._seek(dt)
         # If no data in df have reached year end, so load next year:
-        if not len(self.df):
+        if self._pos == len(self._data):
             self.load_year(dt.year + 1)
-            self.df = self.df.loc[self.df.index >= dt]
+            self._seek(dt)
 
     def jump_days(self, n: int = 1):
         """Jump to first available datetime `n` days after current datetime."""
@@ -127,8 +386,11 @@ class TestDataset:
         self.jump_to_date(next_date)
 
     def jump_to_condition(self, *condition: str):
-        """Filter the `df` attribute to the first available row which meets the
-        given criteria (i.e. search for signals).
+        """Move the cursor to the first available row which meets the
+        given criteria (i.e. search for signals). The loaded data is searched
+        from the cursor onwards, and then each following year's data until a
+        row is found. Every year searched is then loaded (or only the year of
+        the row if no data was loaded), so the loaded data has no gaps.
 
         Args:
             condition: string representing a condition for a specific price
@@ -137,22 +399,54 @@ class TestDataset:
                 `l` (less), `le` (less equal). E.g. to find rows where `close`
                 is greater/equal to 123.45 pass: `close_ge_123.45`.
         """
-        assert condition, "No conditions passed"
-        expressions = list()
-        for cond in condition:
-            column, operator, value = cond.split("_")
-            assert column in self.df.columns, f"Invalid column: {column}"
-            operator = {"g": ">", "ge": ">=", "l": "<", "le": "<="}[operator]
-            value = float(value)
-            expressions.append(f"(self.df['{column}'] {operator} {value})")
-
-        while True:  # Eventually raises an error when tries to load year without data.
-            mask = False
-            for expr in expressions:
-                mask = mask | eval(expr)
-            rows = self.df.loc[mask]
-            if not len(rows):  # No data matches criteria, load next year:
-                self.load_year()
-            else:
-                self.jump_to_date(rows.index[0])
-                break
+        conditions = compile_conditions(*condition)
+        df = self.df
+        hits = df.index[condition_mask(df, conditions)]
+        if len(hits):
+            self._seek(hits[0])
+            return
+        after = self._data.index[-1] if len(self._data) else None
+        frames, years = list(), list()
+        for year, df in self._year_frames(start=after):
+            if after is not None:
+                frames.append(df)
+                years.append(year)
+            hits = self._find(df, conditions, start=after, side="right")
+            if len(hits):
+                self._add_frames(frames if frames else [df], years if years else [year])
+                self._seek(hits[0])
+                return
+        raise ValueError(f"No data meets conditions: {', '.join(condition)}")
+
+    def scan_conditions(self, *condition: str, start: object = None,
+                        end: object = None) -> np.ndarray:
+        """Array of all datetimes in the dataset between the `start` and `end`
+        dates which meet any of the conditions (see `jump_to_condition` for the
+        format). The years are scanned one at a time from the binary store or
+        CSV files, independently of the data loaded to the `df` attribute."""
+        conditions = compile_conditions(*condition)
+        start, end = parse_datetime(start), parse_datetime(end)
+        hits = [self._find(df, conditions, start=start, end=end) for _, df in self._year_frames(start, end)]
+        return np.concatenate(hits) if hits else np.array([], dtype="datetime64[ns]")
+
+    def _year_frames(self, start: datetime.datetime = None,
+                     end: datetime.datetime = None):
+        """Generator of tuples of (year, DataFrame) for each year of data in
+        the dataset which overlaps the dates, in chronological order."""
+        years = self.store.years if self.store is not None else self.available_years
+        for year in years:
+            if (start is not None and year < start.year) or (end is not None and year > end.year):
+                continue
+            yield year, self._open_years([year])[0]
+
+    @staticmethod
+    def _find(df: pd.DataFrame, conditions: list,
+              start: datetime.datetime = None,
+              end: datetime.datetime = None,
+              side: str = "left") -> np.ndarray:
+        """Array of datetimes in a sorted DataFrame meeting the conditions. The
+        `start` date is excluded if `side` is `right`."""
+        i = 0 if start is None else df.index.searchsorted(start, side=side)
+        j = len(df) if end is None else df.index.searchsorted(end, side="right")
+        df = df.iloc[i:j]
+        return df.index.values[condition_mask(df, conditions)]
@@ -1,4 +1,5 @@
 
+from concurrent.futures import ThreadPoolExecutor
 import os
 import pandas as pd
 import requests
@@ -10,8 +11,10 @@ from thales.config.credentials import get_credentials
 from thales.config.exceptions import custom_format_warning, InvalidApiCall
 from thales.config.paths import io_path
 from thales.config.fx_pairs import FXPairs
-from thales.config.utils import PASS, FAIL, now_str
+from thales.config.utils import PASS, FAIL, now_str, SECOND_FORMAT
 from thales.data import CSVLoader
+from thales.data.catalog import Catalog
+from thales.data.segments import atomic_to_csv, check_compactions, write_segment
 
 
 warnings.formatwarning = custom_format_warning
@@ -86,7 +89,8 @@ class AlphaVantageFX:
 
     @staticmethod
     def scrape(*pair: tuple, api_key: str = None, filename: str = "master",
-               function: str = None, rate_limit_pause: int = 10, **kwargs):
+               function: str = None, rate_limit_pause: int = 10,
+               compact_every: int = 10, **kwargs):
         """Iterate through the currency pairs passed as `pair` and save the data
         in CSV files in the `scraped_data` directory.
 
@@ -100,6 +104,10 @@ class AlphaVantageFX:
                 https://www.alphavantage.co/documentation/
             rate_limit_pause (int): number of seconds to wait before trying
                 again when encountering rate limits.
+            compact_every (int): once a pair has this many scrape segments
+                saved, merge them into its base file in a background thread
+                (set to 0 to never compact). Failed compactions are warned
+                about once scraping finishes.
         """
         if not function:
             function = AlphaVantageFX.default_function
@@ -113,71 +121,85 @@ class AlphaVantageFX:
             print(f"Scraping {AlphaVantageFX.name}:")
         rl_fail_msg = f"{FAIL} RateLimitExceeded: trying again every {rate_limit_pause:,} seconds\r"
         inv_fail_msg = f"{FAIL} InvalidApiCall: bad symbol or function ({function})\n"
-        for p in pair:
-            from_symbol, to_symbol = p[0], p[1]
-            pair_name = f"({from_symbol}, {to_symbol})"
-            r, n = None, 0
-            msg = f"- ({from_symbol}, {to_symbol})"
-            while not r:
-                sys.stdout.write(msg + " " * (len(rl_fail_msg) + 5))
-                try:
-                    request_time = now_str()
-                    r = AlphaVantageFX.get(from_symbol=from_symbol, to_symbol=to_symbol, api_key=api_key,
-                                           function=function, **kwargs)
-                except RateLimitExceeded:
-                    sys.stdout.write(f"\r{msg}: {rl_fail_msg}")
-                    time.sleep(rate_limit_pause)  # Pause if rate limit has been exceeded.
-                    continue  # Loop will go forever until requests accepted again.
-                except InvalidApiCall:
-                    # Assume invalid symbol/function and move on to next symbol:
-                    sys.stdout.write(f"\r{msg}: {inv_fail_msg}")
-                    break
-
-            if r:
-                data = r.json()
-                keys = [i for i in data.keys() if i != "Meta Data"]
-                df = pd.DataFrame(data[keys[0]]).T
-                df.reset_index(inplace=True)
-                df.rename(columns={"index": "DateTime"}, inplace=True)
-                df["DateTime"] = pd.to_datetime(df["DateTime"])
-                df["PAIR"] = pair_name
-                df["request_time"] = request_time
-                n = len(df)
-                fp = os.path.join(target, f"{pair_name}.csv")
-                if os.path.exists(fp):
-                    old = CSVLoader.load_by_fxpair(pair_name, src=AlphaVantageFX.name, subdir=function)
-                    df = df.append(old, sort=False)
-                    df.drop_duplicates(keep="first", inplace=True)
-                df.to_csv(fp, encoding="utf-8", index=False)
-                sys.stdout.write(f"\r{msg}: {PASS} {n:,} datapoints\n")
+        catalog = Catalog(src=AlphaVantageFX.name, subdir=function)
+        catalog.get()  # Builds the catalog first if data was scraped before it existed.
+        # Compaction runs in the background while scraping continues, and the
+        # context manager waits for any outstanding compactions on exit:
+        compactions = list()
+        with ThreadPoolExecutor(max_workers=1) as compactor:
+            for p in pair:
+                from_symbol, to_symbol = p[0], p[1]
+                pair_name = f"({from_symbol}, {to_symbol})"
+                r, n = None, 0
+                msg = f"- ({from_symbol}, {to_symbol})"
+                while not r:
+                    sys.stdout.write(msg + " " * (len(rl_fail_msg) + 5))
+                    try:
+                        request_time = now_str(SECOND_FORMAT)
+                        r = AlphaVantageFX.get(from_symbol=from_symbol, to_symbol=to_symbol, api_key=api_key,
+                                               function=function, **kwargs)
+                    except RateLimitExceeded:
+                        sys.stdout.write(f"\r{msg}: {rl_fail_msg}")
+                        time.sleep(rate_limit_pause)  # Pause if rate limit has been exceeded.
+                        continue  # Loop will go forever until requests accepted again.
+                    except InvalidApiCall:
+                        # Assume invalid symbol/function and move on to next symbol:
+                        sys.stdout.write(f"\r{msg}: {inv_fail_msg}")
+                        break
+
+                if r:
+                    data = r.json()
+                    keys = [i for i in data.keys() if i != "Meta Data"]
+                    df = pd.DataFrame(data[keys[0]]).T
+                    df.reset_index(inplace=True)
+                    df.rename(columns={"index": "DateTime"}, inplace=True)
+                    df["DateTime"] = pd.to_datetime(df["DateTime"])
+                    df["PAIR"] = pair_name
+                    df["request_time"] = request_time
+                    n = len(df)
+                    fp = os.path.join(target, f"{pair_name}.csv")
+                    if os.path.exists(fp):
+                        # Only the new data is written, the existing history isn't re-loaded:
+                        seg_fp = write_segment(df, pair_name, request_time=request_time, src=AlphaVantageFX.name,
+                                               subdir=function)
+                        catalog.record_segment(pair_name, df, seg_fp, request_time=request_time,
+                                               datetime_col="DateTime")
+                        if compact_every and catalog.entry(pair_name)["segments"] >= compact_every:
+                            future = compactor.submit(CSVLoader.compact_fxpair, pair_name,
+                                                      src=AlphaVantageFX.name, subdir=function)
+                            compactions.append((pair_name, future))
+                    else:
+                        atomic_to_csv(df, fp)
+                        catalog.record_base(pair_name, df, fp, datetime_col="DateTime")
+                    sys.stdout.write(f"\r{msg}: {PASS} {n:,} datapoints\n")
+        check_compactions(compactions)
 
     @staticmethod
     def scraped(function: str = None):
-        """Pandas DataFrame of stock symbols and dates they were scraped."""
+        """Pandas DataFrame of currency pairs and dates they were last scraped,
+        taken from the function's catalog."""
         if not function:
-            function = AlphaVantage.default_function
-        scrape_dir = os.path.join(AlphaVantage.data_dir, function)
-        symbol = [f.replace(".csv", "") for f in os.listdir(scrape_dir) if f.endswith(".csv")]
-        modified = [os.path.getmtime(os.path.join(scrape_dir, f"{f}.csv")) for f in symbol]
-        df = pd.DataFrame(data={"symbol": symbol, "modified": modified})
-        df["modified"] = pd.to_datetime(df["modified"], unit="s")
+            function = AlphaVantageFX.default_function
+        catalog = Catalog(src=AlphaVantageFX.name, subdir=function).to_dataframe()
+        df = catalog[["symbol", "request_time"]].rename(columns={"symbol": "pair", "request_time": "modified"})
         return df.sort_values(by=["modified"], ascending=False).reset_index(drop=True)
 
     @staticmethod
-    def prioritize(*sym, function: str = None):
-        """Prioritize symbols for scraping in order:
+    def prioritize(*pair, function: str = None):
+        """Prioritize currency pairs for scraping in order:
 
-        1) Symbols which have never been scraped.
-        2) Symbols which have been scraped before, from the least recently
+        1) Pairs which have never been scraped.
+        2) Pairs which have been scraped before, from the least recently
            scraped to the most.
         """
-        if not sym:
-            sym = AlphaVantage.Symbols.get(filename="master")
+        if not pair:
+            pair = AlphaVantageFX.FXPairs.get(filename="master")
         if not function:
-            function = AlphaVantage.default_function
-        scraped = AlphaVantage.scraped(function)
-        scraped = scraped.loc[(scraped["symbol"].isin(sym))]
-        scraped.sort_values(by=["modified"], ascending=True, inplace=True)
-        last = scraped["symbol"].to_list()
-        first = [s for s in sym if s not in last]
+            function = AlphaVantageFX.default_function
+        names = {f"({p[0]}, {p[1]})": p for p in pair}
+        scraped = AlphaVantageFX.scraped(function)
+        scraped = scraped.loc[(scraped["pair"].isin(names))]
+        scraped = scraped.sort_values(by=["modified"], ascending=True)
+        last = [names[p] for p in scraped["pair"]]
+        first = [p for p in pair if p not in last]
         return first + last
@@ -1,4 +1,5 @@
 
+from concurrent.futures import ThreadPoolExecutor
 import os
 import pandas as pd
 import sys
@@ -10,6 +11,8 @@ from thales.config.exceptions import custom_format_warning, InvalidApiCall, Rate
 from thales.config.fieldmaps import apply_fieldmap
 from thales.config.utils import PASS, FAIL, now_str, SECOND_FORMAT
 from thales.config.symbols import Symbols
+from thales.data.catalog import Catalog
+from thales.data.segments import atomic_to_csv, check_compactions, write_segment
 from thales.scrapers.base_scraper import _BaseScraper
 
 warnings.formatwarning = custom_format_warning
@@ -30,7 +33,7 @@ class AlphaVantageStocks(_BaseScraper):
         self.Symbols = Symbols(src=self.name)
 
     def scrape(self, *sym: str, endpoint: str = None,
-               rate_limit_pause: int = 10, **kwargs):
+               rate_limit_pause: int = 10, compact_every: int = 10, **kwargs):
         """Iterate through the stocks passed as `symbol` and save the data in
         CSV files in the `scraped_data` directory.
 
@@ -41,6 +44,10 @@ class AlphaVantageStocks(_BaseScraper):
                 https://www.alphavantage.co/documentation/
             rate_limit_pause: number of seconds to wait before trying again when
                 encountering rate limits.
+            compact_every: once a symbol has this many scrape segments saved,
+                merge them into its base file in a background thread (set to 0
+                to never compact). Failed compactions are warned about once
+                scraping finishes.
         """
         if endpoint is None:
             endpoint = self.default_endpoint
@@ -54,36 +61,47 @@ class AlphaVantageStocks(_BaseScraper):
         line_len = max([len(fail_rl), len(fail_api)])
         spaces = " " * line_len
         endpoint_dir = self.endpoint_data_dir(endpoint=endpoint)
-        for s in sym:
-            s = str.upper(s)
-            r, n = None, 0
-            msg = f"- {s}"
-            while not r:
-                sys.stdout.write(msg + spaces)
-                try:
-                    request_time = now_str(SECOND_FORMAT)
-                    r = self.get(symbol=s, endpoint=endpoint, **kwargs)
-                except RateLimitExceeded:
-                    sys.stdout.write(f"\r{msg}: {fail_rl}")
-                    time.sleep(rate_limit_pause)  # Pause if rate limit has been exceeded.
-                    continue  # Loop will go forever until requests accepted again.
-                except InvalidApiCall:
-                    # Assume invalid symbol/function and move on to next symbol:
-                    sys.stdout.write(f"\r{msg}: {fail_api}")
-                    break
+        catalog = Catalog(src=self.name, subdir=endpoint)
+        catalog.get()  # Builds the catalog first if data was scraped before it existed.
+        # Compaction runs in the background while scraping continues, and the
+        # context manager waits for any outstanding compactions on exit:
+        compactions = list()
+        with ThreadPoolExecutor(max_workers=1) as compactor:
+            for s in sym:
+                s = str.upper(s)
+                r, n = None, 0
+                msg = f"- {s}"
+                while not r:
+                    sys.stdout.write(msg + spaces)
+                    try:
+                        request_time = now_str(SECOND_FORMAT)
+                        r = self.get(symbol=s, endpoint=endpoint, **kwargs)
+                    except RateLimitExceeded:
+                        sys.stdout.write(f"\r{msg}: {fail_rl}")
+                        time.sleep(rate_limit_pause)  # Pause if rate limit has been exceeded.
+                        continue  # Loop will go forever until requests accepted again.
+                    except InvalidApiCall:
+                        # Assume invalid symbol/function and move on to next symbol:
+                        sys.stdout.write(f"\r{msg}: {fail_api}")
+                        break
 
-            if r:
-                json_object = r.json()
-                df = self._json_to_dataframe(json_object)
-                df["SYMBOL"], df["request_time"] = s, request_time
-                fp = os.path.join(endpoint_dir, f"{s}.csv")
-                if os.path.exists(fp):
-                    old = CSVLoader.load_by_symbol(s, src=self.name, subdir=endpoint)
-                    df = df.append(old, sort=False)
-                    df.drop_duplicates(subset=["datetime"], keep="first", inplace=True)
-                df.to_csv(fp, encoding="utf-8", index=False)
-                new_rows = df["request_time"].value_counts()[request_time]
-                sys.stdout.write(f"\r{msg}: {PASS} {new_rows:,} datapoints\n")
+                if r:
+                    json_object = r.json()
+                    df = self._json_to_dataframe(json_object)
+                    df["SYMBOL"], df["request_time"] = s, request_time
+                    fp = os.path.join(endpoint_dir, f"{s}.csv")
+                    if os.path.exists(fp):
+                        # Only the new data is written, the existing history isn't re-loaded:
+                        seg_fp = write_segment(df, s, request_time=request_time, src=self.name, subdir=endpoint)
+                        catalog.record_segment(s, df, seg_fp, request_time=request_time)
+                        if compact_every and catalog.entry(s)["segments"] >= compact_every:
+                            future = compactor.submit(CSVLoader.compact, s, src=self.name, subdir=endpoint)
+                            compactions.append((s, future))
+                    else:
+                        atomic_to_csv(df, fp)
+                        catalog.record_base(s, df, fp)
+                    sys.stdout.write(f"\r{msg}: {PASS} {len(df):,} datapoints\n")
+        check_compactions(compactions)
 
     def _json_to_dataframe(self, json_object) -> pd.DataFrame:
         """Logic to convert JSON returned by the request to a formatted
@@ -97,12 +115,13 @@ class AlphaVantageStocks(_BaseScraper):
         return df
 
     def scraped(self, endpoint: str = None):
-        """Pandas DataFrame of stock symbols and dates they were scraped."""
-        scrape_dir = self.endpoint_data_dir(endpoint)
-        scraped_sym = [f.replace(".csv", "") for f in os.listdir(scrape_dir) if f.endswith(".csv")]
-        modified = [os.path.getmtime(os.path.join(scrape_dir, f"{f}.csv")) for f in scraped_sym]
-        df = pd.DataFrame(data={"symbol": scraped_sym, "modified": modified})
-        df["modified"] = pd.to_datetime(df["modified"], unit="s")
+        """Pandas DataFrame of stock symbols and dates they were last scraped,
+        taken from the endpoint's catalog."""
+        if endpoint is None:
+            endpoint = self.default_endpoint
+        self.endpoint_data_dir(endpoint)  # Make sure the directory exists.
+        catalog = Catalog(src=self.name, subdir=endpoint).to_dataframe()
+        df = catalog[["symbol", "request_time"]].rename(columns={"request_time": "modified"})
         return df.sort_values(by=["modified"], ascending=False).reset_index(drop=True)
 
     def prioritize(self, *sym, endpoint: str = None, **kwargs):